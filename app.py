@@ -1,38 +1,151 @@
+import argparse
+import logging
 import os
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_fixed
 import requests
 
+from llm_backends import OLLAMA_KEEP_ALIVE, OLLAMA_URL, SYSTEM_PROMPT
+from scheduler import CircuitBreaker, ModelScheduler, ModelUnavailableError
+
 # Load environment variables
 load_dotenv()
 
-# Import your OpenAIModel and GeminiModel classes here
-# from your_module import OpenAIModel, GeminiModel
+# Requests and tokens per minute allowed for each backend; None means unlimited.
+# Override with e.g. OPENAI_RPM / OPENAI_TPM to match your account tier.
+RATE_LIMITS = {
+    "openai": (int(os.getenv("OPENAI_RPM", "500")), int(os.getenv("OPENAI_TPM", "60000"))),
+    "gemini": (int(os.getenv("GEMINI_RPM", "15")), int(os.getenv("GEMINI_TPM", "32000"))),
+    "ollama": (None, None),
+}
+
+# Local model used when a hosted backend fails, is unreachable, asks to wait too long or its breaker is open
+FALLBACKS = {"openai": ["ollama"], "gemini": ["ollama"], "ollama": []}
+
+
+class AIModel(ABC):
+    """One chat completion backend, called over a keep-alive requests session."""
+
+    name = None
+
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @abstractmethod
+    def generate_response(self, input_text: str) -> str:
+        """Return the model's reply; raises requests.exceptions.HTTPError on an error status."""
+
+
+class OpenAIModel(AIModel):
+    name = "openai"
+
+    def __init__(self, model: str = "gpt-3.5-turbo", api_key: str = None,
+                 base_url: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"), timeout: float = 60.0):
+        super().__init__(timeout)
+        self.model = model
+        self.base_url = base_url
+        self.session.headers["Authorization"] = f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"
+
+    def generate_response(self, input_text: str) -> str:
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            json={"model": self.model, "messages": [{"role": "system", "content": SYSTEM_PROMPT},
+                                                    {"role": "user", "content": input_text}]},
+            timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+
+class GeminiModel(AIModel):
+    name = "gemini"
+
+    def __init__(self, model: str = "gemini-1.5-flash", api_key: str = None, timeout: float = 60.0):
+        super().__init__(timeout)
+        self.model = model
+        self.session.headers["x-goog-api-key"] = api_key or os.getenv("GEMINI_API_KEY", "")
+
+    def generate_response(self, input_text: str) -> str:
+        response = self.session.post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent",
+            json={"contents": [{"role": "user", "parts": [{"text": input_text}]}]},
+            timeout=self.timeout)
+        response.raise_for_status()
+        candidates = response.json().get("candidates") or []
+        if not candidates or "content" not in candidates[0]:
+            raise RuntimeError(f"Gemini returned no content: {response.text[:200]}")
+        return "".join(part.get("text", "") for part in candidates[0]["content"]["parts"]).strip()
+
+
+class OllamaModel(AIModel):
+    name = "ollama"
+
+    def __init__(self, model: str = "mistral", base_url: str = OLLAMA_URL, timeout: float = 120.0):
+        super().__init__(timeout)
+        self.model = model
+        self.base_url = base_url
+
+    def generate_response(self, input_text: str) -> str:
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "prompt": input_text, "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["response"].strip()
+
+
+MODELS = {"openai": OpenAIModel, "gemini": GeminiModel, "ollama": OllamaModel}
+
 
 class AIModelFacade:
-    def __init__(self, model_name: str = "openai"):
-        if model_name == "openai":
-            self.model = OpenAIModel()
-        elif model_name == "gemini":
-            self.model = GeminiModel()
-        else:
+    """Sends a prompt to the chosen model through its scheduler, falling back to a local model.
+
+    Every backend has a ModelScheduler (token buckets for requests and tokens
+    per minute, backoff that honours Retry-After, and a circuit breaker).
+    When the chosen backend gives up, fails, would need more than the
+    scheduler's max_wait, or its breaker is open, the models in FALLBACKS
+    are tried in order.
+    """
+
+    def __init__(self, model_name: str = "openai", fallback: bool = True):
+        if model_name not in MODELS:
             raise ValueError("Unsupported AI model")
+        self.model_name = model_name
+        self.chain = [model_name] + (FALLBACKS[model_name] if fallback else [])
+        self.models = {}
+        self.schedulers = {}
+        for name in self.chain:
+            requests_per_minute, tokens_per_minute = RATE_LIMITS[name]
+            self.models[name] = MODELS[name]()
+            self.schedulers[name] = ModelScheduler(name, requests_per_minute, tokens_per_minute,
+                                                   breaker=CircuitBreaker(failure_threshold=3, reset_timeout=30.0))
+        self.model = self.models[model_name]
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
     def get_response(self, input_text):
-        try:
-            return self.model.generate_response(input_text)
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:
-                raise requests.exceptions.RetryError("Rate Limit Exceeded") from e
-            raise
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            raise
+        errors = []
+        for name in self.chain:
+            try:
+                response = self.schedulers[name].call(self.models[name].generate_response, input_text)
+            except ModelUnavailableError as e:
+                logging.warning(f"{e}; trying the next model")
+                errors.append(str(e))
+                continue
+            if name != self.model_name:
+                logging.info(f"Answered by fallback model {name} instead of {self.model_name}")
+            return response
+        raise ModelUnavailableError("No model available: " + "; ".join(errors))
+
 
 # Example Usage
 if __name__ == "__main__":
-    facade = AIModelFacade(model_name="openai")  # Change to "gemini" to use GeminiModel
-    response = facade.get_response("Example input text")
+    parser = argparse.ArgumentParser(description="Send a prompt through the AI model facade")
+    parser.add_argument("model", nargs="?", default="openai", choices=list(MODELS),
+                        help="Backend to use (default: openai)")
+    parser.add_argument("--prompt", default="Example input text", help="Text to send to the model")
+    parser.add_argument("--no-fallback", action="store_true",
+                        help="Fail instead of falling back to the local Ollama model")
+    args = parser.parse_args()
+
+    facade = AIModelFacade(model_name=args.model, fallback=not args.no_fallback)
+    response = facade.get_response(args.prompt)
     print(response)
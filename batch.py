@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import ConnectionManager
+from llm_backends import build_prompt
+from sql_validation import inject_limit, validate_sql
+from tracing import span
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list: the value at rank ceil(fraction * n)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(round(fraction * len(ordered), 9)) - 1))]
+
+
+def read_questions(path):
+    """Yield (record id, question, error) from a JSONL file one line at a time.
+
+    A line that is not a JSON object yields (line number, None, error message)
+    instead of stopping the batch.
+    """
+    with open(path, 'r') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                yield record.get("id", line_number), record.get("question"), None
+            except (json.JSONDecodeError, AttributeError) as e:
+                logging.error(f"Skipping line {line_number} of {path}: {e}")
+                yield line_number, None, f"Line {line_number} is not a JSON object: {e}"
+
+
+class ReadOnlyExecutor:
+    """Thread pool running SQL on the connection manager's per-thread read-only connections.
+
+    When a schema model is given, queries are validated (and locally fixed)
+    on the worker's connection before they run. Successful queries are
+    recorded in `workload` (a WorkloadLog) when one is given. With a
+    `row_cap`, at most that many rows are fetched (a LIMIT is injected so
+    SQLite can stop early) and the result says whether more were available.
+    `rewrite(query)`, when given, maps the validated query to the SQL actually
+    run (e.g. a summary-table rewrite); the validated query is what is returned.
+    """
+
+    def __init__(self, connections, workers, schema_model=None, workload=None, row_cap=None, rewrite=None):
+        self.connections = connections
+        self.schema_model = schema_model
+        self.workload = workload
+        self.row_cap = row_cap
+        self.rewrite = rewrite
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sql-worker")
+
+    def _execute(self, query):
+        conn = self.connections.connection()
+        if self.schema_model is not None:
+            query = validate_sql(query, self.schema_model, conn)
+        executed = self.rewrite(query) if self.rewrite else query
+        began = time.perf_counter()
+        with self.connections.budget():
+            if self.row_cap:
+                cursor = conn.execute(inject_limit(executed, self.row_cap + 1))
+                rows = cursor.fetchmany(self.row_cap + 1)
+            else:
+                cursor = conn.execute(executed)
+                rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description or []]
+        truncated = self.row_cap is not None and len(rows) > self.row_cap
+        if truncated:
+            rows = rows[:self.row_cap]
+        if self.workload is not None:
+            self.workload.record(executed, (time.perf_counter() - began) * 1000)
+        return query, columns, rows, truncated
+
+    async def execute(self, query):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self._execute, query)
+
+    def close(self):
+        self._pool.shutdown()
+
+
+async def answer_question(question, backend, executor, build_schema, attempts, query_cache=None,
+                          example_store=None):
+    """Run generate -> execute -> retry for one question and return a result record.
+
+    With an `example_store`, the outcome is recorded there as the REPL does.
+    """
+    error_message = None
+    sql_query = None
+    with span("question", model=backend.model, question=question) as question_span:
+        cached_query = query_cache.get(question, backend.model) if query_cache else None
+        for attempt in range(attempts):
+            question_span.attrs["retries"] = attempt
+            try:
+                with span("attempt", attempt=attempt + 1):
+                    if attempt == 0 and cached_query:
+                        sql_query = cached_query
+                    else:
+                        sql_query = await backend.generate(build_prompt(build_schema(question), question, error_message))
+                    with span("execute_query"):
+                        sql_query, columns, rows, truncated = await executor.execute(sql_query)
+                if query_cache and sql_query != cached_query:
+                    query_cache.put(question, backend.model, sql_query)
+                if example_store:
+                    example_store.record(question, sql_query, success=True, model=backend.model)
+                question_span.attrs["success"] = True
+                return {"sql": sql_query, "columns": columns, "rows": rows, "truncated": truncated,
+                        "attempts": attempt + 1, "error": None}
+            except Exception as e:
+                error_message = str(e)
+                logging.error(f"Batch attempt {attempt + 1} failed for question '{question}'. Error: {error_message}")
+    if example_store:
+        example_store.record(question, sql_query, success=False, model=backend.model)
+    return {"sql": sql_query, "columns": [], "rows": [], "truncated": False, "attempts": attempts,
+            "error": error_message}
+
+
+async def run_batch(input_path, output_path, backend, build_schema, db_path='Chinook.db',
+                    attempts=3, workers=4, query_cache=None, schema_model=None, pool=None, workload=None):
+    """Answer every question in a JSONL file with a bounded pool of workers.
+
+    Input is streamed line by line through a bounded queue, and each result is
+    appended to the output JSONL as soon as it completes (so output order
+    follows completion order). SQL runs on `pool` (a ConnectionManager), or on
+    a new one opened read-only on db_path. Returns throughput, latency and
+    failure stats.
+    """
+    queue = asyncio.Queue(maxsize=workers * 2)
+    executor = ReadOnlyExecutor(pool or ConnectionManager(db_path), workers, schema_model, workload)
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+
+    async def worker(output):
+        nonlocal failures
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            record_id, question, error = item
+            began = time.perf_counter()
+            if question:
+                result = await answer_question(question, backend, executor, build_schema, attempts, query_cache)
+            else:
+                result = {"sql": None, "columns": [], "rows": [], "truncated": False, "attempts": 0,
+                          "error": error or "Missing 'question' field"}
+            latency = time.perf_counter() - began
+            latencies.append(latency)
+            if result["error"]:
+                failures += 1
+            output.write(json.dumps({"id": record_id, "question": question, **result,
+                                     "latency_ms": round(latency * 1000, 1)}, default=str) + "\n")
+            output.flush()
+            queue.task_done()
+
+    try:
+        with open(output_path, 'w') as output:
+            tasks = [asyncio.create_task(worker(output)) for _ in range(workers)]
+            for item in read_questions(input_path):
+                await queue.put(item)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+    finally:
+        executor.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "questions": len(latencies),
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+    logging.info(f"Batch finished: {stats}")
+    return stats
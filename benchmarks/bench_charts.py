@@ -0,0 +1,89 @@
+"""Time the original pyplot graph path against the headless, downsampled ChartRenderer.
+
+Usage: python benchmarks/bench_charts.py [--rows 1000 100000] [--format png] [--legacy-max-rows 10000]
+
+Both paths render to an in-memory PNG (or SVG) with the Agg backend, so
+neither needs a display. The legacy path is the old display_result graph
+branch: one bar per row on a fresh pyplot figure. Frame shapes cover
+categories, dates, numbers against numbers and a text-only result.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rendering import ChartRenderer  # noqa: E402
+
+
+def make_frames(rows):
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2009-01-01") + pd.to_timedelta(rng.integers(0, 1800, rows), unit="D")
+    tracks = [f"Track {n}" for n in range(3500)]
+    return {
+        "track / sales": pd.DataFrame({"Name": rng.choice(tracks, rows), "Sales": rng.random(rows) * 2}),
+        "date / total": pd.DataFrame({"InvoiceDate": dates.strftime("%Y-%m-%d 00:00:00"), "Total": rng.random(rows) * 20}),
+        "ms / bytes": pd.DataFrame({"Milliseconds": rng.integers(1, 10**6, rows), "Bytes": rng.integers(1, 10**7, rows)}),
+        "country / city": pd.DataFrame({"Country": rng.choice(["USA", "Canada", "Brazil", "France"], rows),
+                                        "City": rng.choice(["Boston", "Toronto", "Paris"], rows)}),
+    }
+
+
+def legacy_render(question, df, fmt):
+    """The original display_result graph branch, saved instead of shown."""
+    plt.figure(figsize=(10, 6))
+    if df.shape[1] == 2:
+        plt.bar(df.iloc[:, 0], df.iloc[:, 1])
+        plt.xlabel(df.columns[0])
+        plt.ylabel(df.columns[1])
+    else:
+        df.plot(kind='bar')
+    plt.title(question)
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format=fmt)
+    plt.close("all")
+    return buffer.getvalue()
+
+
+def timed(function):
+    began = time.perf_counter()
+    try:
+        function()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    return time.perf_counter() - began, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--legacy-max-rows", type=int, default=10000,
+                        help="Skip the legacy path above this many rows (it draws one bar per row and takes minutes at 100k)")
+    args = parser.parse_args()
+
+    renderer = ChartRenderer()
+    renderer.render("warm up", make_frames(10)["track / sales"], fmt=args.format)
+    print(f"{'rows':>8}  {'frame':<16} {'legacy (s)':>11} {'renderer (s)':>13} {'speedup':>8}")
+    for rows in args.rows:
+        for name, df in make_frames(rows).items():
+            new, _ = timed(lambda: renderer.render(name, df, fmt=args.format))
+            if rows > args.legacy_max_rows:
+                legacy, error = None, "skipped"
+            else:
+                legacy, error = timed(lambda: legacy_render(name, df, args.format))
+            legacy_text = f"{legacy:>11.3f}" if legacy is not None else f"{error[:11]:>11}"
+            speedup = f"{legacy / new:>7.1f}x" if legacy is not None else f"{'-':>8}"
+            print(f"{rows:>8}  {name:<16} {legacy_text} {new:>13.3f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Time-to-SQL for a full Ollama completion vs. a streamed one that stops at the first complete statement.
+
+Usage: python benchmarks/bench_ollama_stream.py [--token-latency 0.02] [--repeat 3]
+
+A fake Ollama server answers with a rambling completion (a sentence of
+preamble, the query, then a long explanation) one word per --token-latency
+seconds. Three request styles are timed through the same keep-alive session:
+the original non-streaming request, a non-streaming request with the stop
+options, and the streaming request sql-gpt.py now makes.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_ollama import start_fake_ollama  # noqa: E402
+from llm_backends import OllamaStream, ollama_payload  # noqa: E402
+from sql_validation import strip_sql  # noqa: E402
+
+SQL = "SELECT BillingCountry, SUM(Total) AS Sales FROM Invoice GROUP BY BillingCountry ORDER BY Sales DESC LIMIT 5;"
+EXPLANATION = " ".join(["This query sums the invoice totals for each billing country and keeps the five largest."] * 15)
+
+COMPLETIONS = {
+    "fenced": f"Here is the SQL query you asked for:\n```sql\n{SQL}\n```\n\n{EXPLANATION}",
+    "bare": f"{SQL}\n-- {EXPLANATION}",
+}
+
+
+def full(session, url, prompt):
+    response = session.post(url, json={"model": "mistral", "prompt": prompt, "stream": False})
+    response.raise_for_status()
+    return response.json()["response"]
+
+
+def full_with_stop(session, url, prompt):
+    response = session.post(url, json={**ollama_payload("mistral", prompt), "stream": False})
+    response.raise_for_status()
+    return response.json()["response"]
+
+
+def streamed(session, url, prompt):
+    stream = OllamaStream()
+    response = session.post(url, json=ollama_payload("mistral", prompt), stream=True)
+    try:
+        for line in response.iter_lines():
+            if stream.feed(line):
+                break
+    finally:
+        response.close()
+    return stream.result()
+
+
+MODES = {"full": full, "full + stop": full_with_stop, "streamed": streamed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Seconds per generated word (default: 0.02)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    expected = strip_sql(SQL)
+    for name, completion in COMPLETIONS.items():
+        server = start_fake_ollama(response=completion, token_latency=args.token_latency)
+        url = f"{server.url}/api/generate"
+        session = requests.Session()
+        print(f"\n{name} completion ({len(completion.split())} words at {args.token_latency * 1000:.0f} ms each)")
+        print(f"{'mode':<12} {'time-to-SQL ms':>15} {'words generated':>16}  sql ok")
+        for mode, request in MODES.items():
+            best = None
+            generated = server.tokens_generated
+            for _ in range(args.repeat):
+                began = time.perf_counter()
+                sql = strip_sql(request(session, url, "Total sales by country"))
+                elapsed = (time.perf_counter() - began) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            # A cancelled stream is noticed on the server's next write, so let it catch up before counting
+            time.sleep(args.token_latency * 3)
+            words = (server.tokens_generated - generated) / args.repeat
+            print(f"{mode:<12} {best:>15.1f} {words:>16.0f}  {'yes' if sql == expected else 'NO: ' + sql[:40]}")
+        print(f"Streams cancelled by the client: {server.streams_cancelled}")
+        session.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
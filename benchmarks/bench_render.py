@@ -0,0 +1,74 @@
+"""Compare the row-by-row and columnar table rendering paths used by display_result.
+
+Usage: python benchmarks/bench_render.py [--rows 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rendering import build_table  # noqa: E402
+
+
+def iterrows_table(title, df):
+    """The original display_result implementation."""
+    table = Table(title=title)
+    for column in df.columns:
+        table.add_column(column, style="cyan")
+    for _, row in df.iterrows():
+        table.add_row(*[str(val) for val in row])
+    return table
+
+
+def make_frame(rows):
+    """A frame shaped like a typical InvoiceLine/Track join result."""
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2009-01-01") + pd.to_timedelta(rng.integers(0, 1800, rows), unit="D")
+    return pd.DataFrame({
+        "InvoiceLineId": np.arange(rows),
+        "InvoiceDate": dates.strftime("%Y-%m-%d 00:00:00"),
+        "Name": rng.choice(["For Those About To Rock", "Balls to the Wall", "Fast As a Shark"], rows),
+        "UnitPrice": rng.choice([0.99, 1.99], rows),
+        "Quantity": rng.integers(1, 3, rows),
+        "Total": rng.random(rows) * 20,
+    })
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--print", action="store_true",
+                        help="Also time printing the table to a null console")
+    args = parser.parse_args()
+
+    console = Console(file=open(os.devnull, "w"), width=160)
+    print(f"{'rows':>8} {'iterrows (s)':>14} {'columnar (s)':>14} {'speedup':>8}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        if args.print:
+            legacy = best_of(lambda: console.print(iterrows_table("bench", df)), args.repeat)
+            columnar = best_of(lambda: console.print(build_table("bench", df)), args.repeat)
+        else:
+            legacy = best_of(lambda: iterrows_table("bench", df), args.repeat)
+            columnar = best_of(lambda: build_table("bench", df), args.repeat)
+        print(f"{rows:>8} {legacy:>14.4f} {columnar:>14.4f} {legacy / columnar:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Check sql-gpt.py cold-start time against a budget using `python -X importtime`.
+
+Usage: python benchmarks/bench_startup.py [--budget-ms 250] [--runs 5]
+
+Exits non-zero when the import time is over budget or when a module that
+should be loaded lazily (pandas, matplotlib, the OpenAI SDK, ...) is imported
+just to print --help.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Import-time budget for `sql-gpt.py --help`, in milliseconds
+STARTUP_BUDGET_MS = 250
+
+# Modules that must not be imported before they are actually needed
+LAZY_MODULES = ["pandas", "numpy", "matplotlib", "openai", "httpx", "requests"]
+
+
+def measure(command):
+    """Run the command under -X importtime and return {top-level module: cumulative us}."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *command],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5, help="Best of this many runs is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest imports to list")
+    args = parser.parse_args()
+
+    command = ["sql-gpt.py", "--help"]
+    runs = [measure(command) for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: sum(modules.values()))
+    total_ms = sum(best.values()) / 1000
+
+    print(f"Import time for {' '.join(command)}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(best.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    loaded = sorted({name.split(".")[0] for modules in runs for name in modules} & set(LAZY_MODULES))
+    failed = False
+    if loaded:
+        print(f"FAIL: modules that should load lazily were imported: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time is over budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
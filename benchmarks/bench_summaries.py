@@ -0,0 +1,106 @@
+"""Time README-style aggregate questions on the raw tables vs. the precomputed summaries.
+
+Usage: python benchmarks/bench_summaries.py [--scale 10 100] [--repeat 3]
+
+For each scale a database is built from chinook_sqlite.sql in a temporary
+directory, the summaries are created, and every query is run as written and
+as rewritten (results are checked to match). It then appends 1% more
+invoices and compares an incremental refresh with a full rebuild.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import summary_tables  # noqa: E402
+from build_chinook import build  # noqa: E402
+from schema_model import SchemaModel  # noqa: E402
+
+QUERIES = [
+    "SELECT strftime('%Y', InvoiceDate) AS Year, SUM(Total) AS Sales FROM Invoice GROUP BY Year ORDER BY Year DESC LIMIT 5",
+    "SELECT strftime('%m', InvoiceDate) AS Month, SUM(Total) AS Sales FROM Invoice "
+    "WHERE strftime('%Y', InvoiceDate) = '2012' GROUP BY Month ORDER BY Month",
+    "SELECT BillingCountry, SUM(Total) AS Sales FROM Invoice GROUP BY BillingCountry ORDER BY Sales DESC",
+    "SELECT g.Name, SUM(il.UnitPrice * il.Quantity) AS Sales FROM InvoiceLine il JOIN Track t ON il.TrackId = t.TrackId "
+    "JOIN Genre g ON t.GenreId = g.GenreId GROUP BY g.Name ORDER BY Sales DESC",
+    "SELECT al.Title, SUM(il.UnitPrice * il.Quantity) AS Sales FROM InvoiceLine il JOIN Track t ON il.TrackId = t.TrackId "
+    "JOIN Album al ON t.AlbumId = al.AlbumId GROUP BY al.AlbumId ORDER BY Sales DESC, al.Title LIMIT 5",
+    "SELECT ar.Name, SUM(il.UnitPrice * il.Quantity) AS Sales FROM InvoiceLine il JOIN Track t ON il.TrackId = t.TrackId "
+    "JOIN Album al ON t.AlbumId = al.AlbumId JOIN Artist ar ON al.ArtistId = ar.ArtistId "
+    "GROUP BY ar.ArtistId ORDER BY Sales DESC LIMIT 5",
+]
+
+
+def best_ms(conn, sql, repeat):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        elapsed = (time.perf_counter() - began) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def rounded(rows):
+    """Rows with floats rounded, in a fixed order (ties in ORDER BY may come back either way)."""
+    return sorted((tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows), key=repr)
+
+
+def append_invoices(conn, fraction):
+    """Copy the newest `fraction` of invoices (with their lines) under new ids."""
+    max_invoice, invoices = conn.execute("SELECT MAX(InvoiceId), COUNT(*) FROM Invoice").fetchone()
+    max_line = conn.execute("SELECT MAX(InvoiceLineId) FROM InvoiceLine").fetchone()[0]
+    first = max_invoice - max(1, int(invoices * fraction)) + 1
+    conn.execute("BEGIN")
+    conn.execute("INSERT INTO Invoice SELECT InvoiceId + ?, CustomerId, InvoiceDate, BillingAddress, BillingCity, "
+                 "BillingState, BillingCountry, BillingPostalCode, Total FROM Invoice WHERE InvoiceId >= ?",
+                 (max_invoice, first))
+    conn.execute("INSERT INTO InvoiceLine SELECT InvoiceLineId + ?, InvoiceId + ?, TrackId, UnitPrice, Quantity "
+                 "FROM InvoiceLine WHERE InvoiceId >= ?", (max_line, max_invoice, first))
+    conn.execute("COMMIT")
+
+
+def run_scale(scale, repeat, workdir):
+    path = os.path.join(workdir, f"chinook_x{scale}.db")
+    build(path, scale, os.path.join(ROOT, "chinook_sqlite.sql"))
+    conn = sqlite3.connect(path, isolation_level=None)
+    initial = summary_tables.refresh(conn)
+    schema_model = SchemaModel.from_connection(conn, hidden=summary_tables.SUMMARY_TABLES)
+
+    print(f"\nScale x{scale}: summaries built in {initial['elapsed_ms']} ms")
+    print(f"{'raw ms':>10} {'summary ms':>11} {'speedup':>8}  summary")
+    for sql in QUERIES:
+        rewritten, summary = summary_tables.rewrite(sql, schema_model, conn)
+        raw_ms, raw_rows = best_ms(conn, sql, repeat)
+        if not summary:
+            print(f"{raw_ms:>10.2f} {'-':>11} {'-':>8}  (not rewritten) {sql[:60]}")
+            continue
+        summary_ms, summary_rows = best_ms(conn, rewritten, repeat)
+        match = "" if rounded(raw_rows) == rounded(summary_rows) else "  RESULTS DIFFER"
+        print(f"{raw_ms:>10.2f} {summary_ms:>11.2f} {raw_ms / max(summary_ms, 1e-6):>7.0f}x  {summary}{match}")
+
+    append_invoices(conn, 0.01)
+    incremental = summary_tables.refresh(conn)
+    full = summary_tables.refresh(conn, full=True)
+    print(f"After appending 1% more invoices: incremental refresh {incremental['elapsed_ms']} ms "
+          f"({sum(incremental['rows'].values()):,} new rows), full rebuild {full['elapsed_ms']} ms")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scale:
+            run_scale(scale, args.repeat, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Conversions/sec of the schema-driven XML codec against the two LLM hops it replaces.
+
+Usage: python benchmarks/bench_xml_codec.py [--records 10000] [--llm-latency 1.5]
+
+Each conversion is what communicate_with_legacy_api does per request: Person
+JSON -> XML for the legacy app, and XML -> JSON on the way back. The LLM path
+is not called (it needs an OpenAI key and is not deterministic); its rate is
+derived from --llm-latency seconds per chat completion, two per conversion.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from person_models import Person  # noqa: E402
+from xml_codec import XmlCodec  # noqa: E402
+
+
+def make_people(count, seed=0):
+    rng = random.Random(seed)
+    makes = [("Toyota", "Camry"), ("Honda", "Civic"), ("Ford", "F-150"), ("Tesla", "Model 3")]
+    people = []
+    for n in range(count):
+        vehicles = []
+        for v in range(rng.randint(0, 3)):
+            make, model = rng.choice(makes)
+            year = rng.randint(2000, 2024)
+            vehicles.append({"make": make, "model": model, "year": year, "registration": {
+                "license_plate": f"{n % 1000:03d} {v}{rng.randint(100, 999)}",
+                "registration_date": f"{year}-01-01", "expiry_date": f"{year + 5}-01-01"}})
+        people.append(Person(name=f"Person {n}", address=f"{n} Main St & 2nd Ave", email=f"person{n}@example.com",
+                             alias=f"P{n}", vehicles=vehicles).to_json())
+    return people
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="Seconds per LLM completion (default: 1.5)")
+    args = parser.parse_args()
+
+    codec = XmlCodec(Person)
+    payloads = make_people(args.records)
+
+    began = time.perf_counter()
+    documents = [codec.encode(Person.from_json(payload)) for payload in payloads]
+    encode_s = time.perf_counter() - began
+
+    began = time.perf_counter()
+    decoded = [codec.decode(document).to_json() for document in documents]
+    decode_s = time.perf_counter() - began
+    assert decoded == payloads, "round trip changed the data"
+
+    batch = ("<Persons>" + "".join(documents) + "</Persons>").encode()
+    began = time.perf_counter()
+    streamed = sum(1 for _ in codec.iterdecode(batch))
+    stream_s = time.perf_counter() - began
+
+    print(f"{args.records:,} records, {len(batch) / args.records:.0f} bytes of XML each")
+    print(f"JSON -> XML               {args.records / encode_s:>12,.0f} /sec")
+    print(f"XML -> JSON               {args.records / decode_s:>12,.0f} /sec")
+    print(f"Round trip (codec)        {args.records / (encode_s + decode_s):>12,.0f} /sec")
+    print(f"iterparse batch decode    {streamed / stream_s:>12,.0f} /sec")
+    print(f"Round trip (2 LLM calls)  {1 / (2 * args.llm_latency):>12,.2f} /sec at {args.llm_latency}s per call")
+
+
+if __name__ == "__main__":
+    main()
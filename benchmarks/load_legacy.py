@@ -0,0 +1,73 @@
+"""Load test the legacy app: records/sec through /persons at 1, 100 and 10k records per request.
+
+Usage: python benchmarks/load_legacy.py [--total 10000] [--sizes 1 100 10000] [--baseline 1000]
+
+legacyapp.py is served in-process by a threaded Werkzeug server and fed by
+genai-driver.py's batched client (keep-alive session, streamed request
+bodies). --baseline also times that many records through the original path:
+one /person POST per record on a new connection.
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import legacyapp  # noqa: E402
+from bench_xml_codec import make_people  # noqa: E402
+
+
+def load_driver():
+    spec = importlib.util.spec_from_file_location("genai_driver", os.path.join(ROOT, "genai-driver.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=int, default=10000, help="Records sent for each batch size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000], help="Records per request")
+    parser.add_argument("--baseline", type=int, default=1000, help="Records sent one per new connection, 0 to skip")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, legacyapp.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    driver = load_driver()
+    driver.LEGACY_URL = f"http://127.0.0.1:{server.server_port}"
+    payloads = make_people(args.total)
+
+    print(f"{'records/request':>16} {'requests':>9} {'seconds':>9} {'records/sec':>12}")
+    if args.baseline:
+        began = time.perf_counter()
+        for payload in payloads[:args.baseline]:
+            requests.post(f"{driver.LEGACY_URL}/person", data=driver.json_to_xml(payload),
+                          headers={'Content-Type': 'application/xml'}).raise_for_status()
+        elapsed = time.perf_counter() - began
+        print(f"{'1 (/person)':>16} {args.baseline:>9,} {elapsed:>9.2f} {args.baseline / elapsed:>12,.0f}")
+
+    for size in args.sizes:
+        began = time.perf_counter()
+        replies = driver.communicate_with_legacy_api(payloads, batch_size=size)
+        elapsed = time.perf_counter() - began
+        if replies is None:
+            print(f"{size:>16,} failed")
+            continue
+        received = sum(int(reply["Response"]["Received"]) for reply in json.loads(replies))
+        assert received == args.total, f"legacy app received {received} of {args.total} records"
+        requests_made = -(-args.total // size)
+        print(f"{size:>16,} {requests_made:>9,} {elapsed:>9.2f} {args.total / elapsed:>12,.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
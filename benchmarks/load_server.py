@@ -0,0 +1,117 @@
+"""Load generator for the POST /query service, with and without in-flight coalescing.
+
+Usage: python benchmarks/load_server.py [--clients 32] [--requests 2000] [--latency 0.2] [--distinct 20]
+
+The service from server.py is started in-process on a threaded Werkzeug
+server with a replay backend (the corpus answers after --latency seconds
+each, at most --llm-concurrency at a time like the OpenAI backend's default
+limit, standing in for the LLM) and the question cache off, so every request
+that is not coalesced runs a full generate -> validate -> execute pipeline.
+Clients pick questions at random from the first --distinct corpus questions,
+so identical questions overlap the way popular dashboards do.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from batch import percentile  # noqa: E402
+from db_pool import ConnectionManager  # noqa: E402
+from llm_backends import ReplayBackend  # noqa: E402
+from schema_model import SchemaModel  # noqa: E402
+from server import QueryService, create_app  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus.jsonl")
+
+
+def run(args, questions, coalesce):
+    pool = ConnectionManager(os.path.join(ROOT, "Chinook.db"))
+    schema_model = SchemaModel.from_connection(pool.connection())
+    backend = ReplayBackend.from_jsonl(CORPUS, latency=args.latency, jitter=args.latency / 4, seed=args.seed,
+                                       max_concurrency=args.llm_concurrency)
+    service = QueryService(lambda model: backend, pool, schema_model,
+                           lambda question: schema_model.prompt_for(question)[0],
+                           workers=8, default_model="gpt-3.5-turbo", coalesce=coalesce)
+    server = make_server("127.0.0.1", 0, create_app(service), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/query"
+
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    remaining = iter(range(args.requests))
+
+    def client(seed):
+        nonlocal failures
+        rng = random.Random(seed)
+        session = requests.Session()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            began = time.perf_counter()
+            response = session.post(url, json={"question": rng.choice(questions)})
+            elapsed = (time.perf_counter() - began) * 1000
+            with lock:
+                latencies.append(elapsed)
+                failures += response.status_code != 200
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(args.seed + n,)) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    stats = service.stats()
+    server.shutdown()
+    service.close()
+    pool.close_all()
+    return {
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "failures": failures,
+        "pipelines": stats["pipelines"],
+        "coalesced": stats["coalesced"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests per run")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency in seconds")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Simultaneous simulated LLM calls")
+    parser.add_argument("--distinct", type=int, default=20, help="Number of different questions asked")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    logging.getLogger().setLevel(logging.CRITICAL)
+    with open(CORPUS, 'r') as file:
+        questions = [json.loads(line)["question"] for line in file if line.strip()][:args.distinct]
+
+    print(f"{args.requests} requests from {args.clients} clients over {len(questions)} questions, "
+          f"{args.latency * 1000:.0f} ms simulated LLM latency")
+    print(f"{'coalescing':<11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'pipelines':>10} "
+          f"{'coalesced':>10} {'non-200':>8}")
+    for coalesce in (False, True):
+        result = run(args, questions, coalesce)
+        print(f"{'on' if coalesce else 'off':<11} {result['requests_per_s']:>8} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['pipelines']:>10} {result['coalesced']:>10} "
+              f"{result['failures']:>8}")
+
+
+if __name__ == "__main__":
+    main()
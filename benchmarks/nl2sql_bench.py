@@ -0,0 +1,183 @@
+"""Replay a natural-language question corpus through the NL->SQL pipeline and report performance.
+
+Usage: python benchmarks/nl2sql_bench.py [--backend replay] [--latency 0.2] [--passes 2] [--output bench.json]
+
+The default `replay` backend returns the canned answers stored in the corpus
+after a simulated (seeded, deterministic) latency, so runs need neither an
+OpenAI key nor Ollama. Every question is checked against its golden SQL and
+the report is JSON with sorted keys, ready to diff between versions.
+
+With --examples K the prompt also carries the K most similar other corpus
+questions and their golden SQL (leave-one-out), so running with --examples 0
+and --examples 3 compares first-attempt success with and without retrieval.
+Replayed answers do not depend on the prompt; use a live backend for that
+comparison and the replay backend for the retrieval overhead.
+
+With a live backend, --record FILE appends every model answer to FILE as
+JSONL. Pass that file to a later replay run with --answers FILE to replay
+those answers, in the order they were recorded, instead of the corpus's own.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import tracing  # noqa: E402
+from batch import ReadOnlyExecutor, answer_question, percentile  # noqa: E402
+from db_pool import ConnectionManager  # noqa: E402
+from example_store import ExampleStore  # noqa: E402
+from llm_backends import RecordingBackend, ReplayBackend, create_backend  # noqa: E402
+from query_cache import QueryCache  # noqa: E402
+from schema_model import SchemaModel  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "corpus.jsonl")
+
+
+def load_corpus(path):
+    with open(path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def normalize_rows(rows, ordered):
+    """Make result rows comparable: round floats, and ignore order unless the query sorts."""
+    normalized = [tuple(round(value, 4) if isinstance(value, float) else value for value in row) for row in rows]
+    return normalized if ordered else sorted(normalized, key=repr)
+
+
+def is_correct(result, golden_rows, golden_sql):
+    if result["error"]:
+        return False
+    ordered = "order by" in golden_sql.lower()
+    return normalize_rows(result["rows"], ordered) == normalize_rows(golden_rows, ordered)
+
+
+def distribution(values):
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(values, 0.50), 2),
+        "p95_ms": round(percentile(values, 0.95), 2),
+        "max_ms": round(max(values), 2),
+        "mean_ms": round(sum(values) / len(values), 2),
+    }
+
+
+def summarize(records, elapsed):
+    answered = [record for record in records if record["success"]]
+    return {
+        "questions": len(records),
+        "success_rate": round(len(answered) / len(records), 4) if records else 0.0,
+        "correct_rate": round(sum(record["correct"] for record in records) / len(records), 4) if records else 0.0,
+        "first_attempt_success_rate": round(
+            sum(record["success"] and record["attempts"] == 1 for record in records) / len(records), 4) if records else 0.0,
+        "retries": sum(max(record["attempts"] - 1, 0) for record in records),
+        "throughput_qps": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "end_to_end": distribution([record["latency_ms"] for record in records]),
+    }
+
+
+async def run(args, corpus):
+    pool = ConnectionManager(os.path.join(ROOT, "Chinook.db"))
+    schema_model = SchemaModel.from_connection(pool.connection())
+    golden = {item["id"]: pool.connection().execute(item["golden_sql"]).fetchall() for item in corpus}
+
+    if args.backend == "replay":
+        backend = ReplayBackend.from_jsonl(args.answers or args.corpus, latency=args.latency, jitter=args.jitter, seed=args.seed)
+    else:
+        backend = create_backend(args.backend)
+        if args.record:
+            backend = RecordingBackend(backend, args.record)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        query_cache = None if args.no_cache else QueryCache(
+            path=os.path.join(cache_dir, "query_cache.db"), schema_text=schema_model.render(),
+            db_path=os.path.join(ROOT, "Chinook.db"))
+        examples = ExampleStore(path=os.path.join(cache_dir, "examples.db"))
+        for item in corpus:
+            examples.record(item["question"], item["golden_sql"])
+
+        def build_schema(question):
+            schema = schema_model.prompt_for(question)[0]
+            return schema + examples.prompt_for(question, args.examples) if args.examples else schema
+
+        executor = ReadOnlyExecutor(pool, args.workers, schema_model)
+        limit = asyncio.Semaphore(args.workers)
+        passes = []
+        tracing.reset()
+
+        async def one(item, pass_number):
+            async with limit:
+                began = time.perf_counter()
+                result = await answer_question(item["question"], backend, executor,
+                                               build_schema, args.attempts, query_cache)
+                latency_ms = round((time.perf_counter() - began) * 1000, 2)
+            return {"id": item["id"], "pass": pass_number, "success": result["error"] is None,
+                    "correct": is_correct(result, golden[item["id"]], item["golden_sql"]),
+                    "attempts": result["attempts"], "latency_ms": latency_ms}
+
+        async with backend:
+            for pass_number in range(1, args.passes + 1):
+                began = time.perf_counter()
+                records = await asyncio.gather(*(one(item, pass_number) for item in corpus))
+                passes.append((records, time.perf_counter() - began))
+        executor.close()
+        examples.close()
+        cache_stats = query_cache.stats() if query_cache else None
+        if query_cache:
+            query_cache.close()
+
+    all_records = [record for records, _ in passes for record in records]
+    return {
+        "config": {"backend": args.backend, "latency_s": args.latency, "jitter_s": args.jitter, "seed": args.seed,
+                   "passes": args.passes, "workers": args.workers, "attempts": args.attempts,
+                   "query_cache": not args.no_cache, "examples": args.examples, "corpus": os.path.basename(args.corpus),
+                   "answers": os.path.basename(args.answers) if args.answers else None},
+        "summary": summarize(all_records, sum(elapsed for _, elapsed in passes)),
+        "passes": [summarize(records, elapsed) for records, elapsed in passes],
+        "stages": tracing.summary(),
+        "query_cache": cache_stats,
+        "questions": all_records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--backend", default="replay", choices=["replay", "gpt-3.5-turbo", "gpt-4", "mistral"])
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated replay latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Extra uniform random replay latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--passes", type=int, default=2, help="Run the corpus this many times (later passes hit the cache)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the question-to-SQL cache")
+    parser.add_argument("--examples", type=int, default=0,
+                        help="Few-shot examples retrieved from the rest of the corpus per prompt (default: 0, off)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--record", help="Append a live backend's answers to this JSONL file for later replay")
+    parser.add_argument("--answers", help="Replay answers recorded with --record instead of the corpus's own")
+    args = parser.parse_args()
+    if args.record and args.backend == "replay":
+        parser.error("--record needs a live --backend")
+
+    report = asyncio.run(run(args, load_corpus(args.corpus)))
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+        summary = report["summary"]
+        print(f"{summary['questions']} questions, {summary['correct_rate']:.0%} correct, "
+              f"{summary['first_attempt_success_rate']:.0%} first-attempt success, "
+              f"p50 {summary['end_to_end']['p50_ms']} ms, p95 {summary['end_to_end']['p95_ms']} ms -> {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Build a Chinook SQLite database from chinook_sqlite.sql, optionally scaled up.
+
+Usage: python build_chinook.py --scale 100 --output chinook_x100.db
+
+Rows are bulk loaded in one transaction with executemany, journalling and
+fsync switched off, and the secondary indexes created only after the data is
+in. With --scale N the Track, Invoice and InvoiceLine tables hold N copies of
+the original rows; copy k offsets every id by k times the original maximum, so
+invoice lines in a copy point at that copy's invoices and tracks and foreign
+keys stay consistent.
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import time
+
+SCRIPT_PATH = 'chinook_sqlite.sql'
+
+# Tables multiplied by --scale, with the foreign keys that point into another scaled table
+SCALED_TABLES = {
+    "Track": {},
+    "Invoice": {},
+    "InvoiceLine": {"InvoiceId": "Invoice", "TrackId": "Track"},
+}
+
+# Pragmas used only while loading; the finished file goes back to normal journalling
+LOAD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "cache_size": -256 * 1024,
+    "temp_store": "MEMORY",
+}
+
+INSERT_PATTERN = re.compile(r"INSERT INTO \[(\w+)\] \((.*?)\) VALUES \((.*)\);$")
+VALUE_PATTERN = re.compile(r"'((?:[^']|'')*)'|(NULL)|(-?\d+\.\d+)|(-?\d+)")
+
+
+def parse_values(text):
+    """Turn the VALUES list of a generated INSERT into Python values."""
+    values = []
+    for string, null, real, integer in VALUE_PATTERN.findall(text):
+        if null:
+            values.append(None)
+        elif real:
+            values.append(float(real))
+        elif integer:
+            values.append(int(integer))
+        else:
+            values.append(string.replace("''", "'"))
+    return values
+
+
+def read_script(path):
+    """Split the script into CREATE TABLE statements, CREATE INDEX statements and rows per table.
+
+    Rows are full tuples in the table's column order; the script leaves NULL
+    columns out of individual INSERTs, so those are filled in with None.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        text = re.sub(r"/\*.*?\*/", "", file.read(), flags=re.DOTALL)
+
+    tables, indexes = [], []
+    inserts = [line.strip() for line in text.splitlines() if line.startswith("INSERT INTO")]
+    for statement in re.split(r";\s*\n", re.sub(r"^INSERT INTO.*$", "", text, flags=re.MULTILINE)):
+        statement = statement.strip()
+        if statement.startswith("CREATE TABLE"):
+            tables.append(statement)
+        elif statement.startswith("CREATE INDEX"):
+            indexes.append(statement)
+    return tables, indexes, inserts
+
+
+def rows_by_table(inserts, columns):
+    """Group INSERT statements into full-width row tuples per table."""
+    rows = {table: [] for table in columns}
+    for statement in inserts:
+        match = INSERT_PATTERN.match(statement)
+        if not match:
+            raise ValueError(f"Unrecognised INSERT statement: {statement[:80]}")
+        table, names, values = match.groups()
+        record = dict(zip(re.findall(r"\[(\w+)\]", names), parse_values(values)))
+        rows[table].append(tuple(record.get(column) for column in columns[table]))
+    return rows
+
+
+def scaled_rows(table, rows, columns, max_ids, scale):
+    """Yield `scale` copies of a table's rows with primary and foreign keys offset per copy."""
+    offsets = {position: max_ids[target] for position, target in
+               [(0, table)] + [(columns.index(column), target) for column, target in SCALED_TABLES[table].items()]}
+    for copy in range(scale):
+        if copy == 0:
+            yield from rows
+            continue
+        for row in rows:
+            row = list(row)
+            for position, step in offsets.items():
+                row[position] += copy * step
+            yield tuple(row)
+
+
+def build(output, scale=1, script_path=SCRIPT_PATH):
+    """Load the script (scaled `scale` times) into a new database at `output`; returns load stats."""
+    tables, indexes, inserts = read_script(script_path)
+    conn = sqlite3.connect(output, isolation_level=None)
+    for name, value in LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    for statement in tables:
+        conn.execute(statement)
+
+    columns = {name: [row[1] for row in conn.execute(f"PRAGMA table_info([{name}])")]
+               for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    rows = rows_by_table(inserts, columns)
+    max_ids = {table: max(row[0] for row in rows[table]) for table in SCALED_TABLES}
+
+    stats = {"tables": {}}
+    began = time.perf_counter()
+    conn.execute("BEGIN")
+    for table, table_rows in rows.items():
+        placeholders = ", ".join("?" * len(columns[table]))
+        if table in SCALED_TABLES:
+            table_rows = scaled_rows(table, table_rows, columns[table], max_ids, scale)
+        cursor = conn.executemany(f"INSERT INTO [{table}] VALUES ({placeholders})", table_rows)
+        stats["tables"][table] = cursor.rowcount
+    conn.execute("COMMIT")
+    load_s = time.perf_counter() - began
+
+    began = time.perf_counter()
+    for statement in indexes:
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+    index_s = time.perf_counter() - began
+
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+
+    total_rows = sum(stats["tables"].values())
+    stats.update({
+        "rows": total_rows,
+        "load_s": round(load_s, 3),
+        "index_s": round(index_s, 3),
+        "rows_per_s": round(total_rows / load_s) if load_s else 0,
+    })
+    logging.info(f"Built {output} at scale {scale}: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (and optionally scale up) the Chinook database")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Copies of Track, Invoice and InvoiceLine to load, e.g. 10, 100 or 1000 (default: 1)")
+    parser.add_argument("--output", help="Database file to create (default: chinook_x<scale>.db)")
+    parser.add_argument("--script", default=SCRIPT_PATH, help="Chinook SQL script to load")
+    parser.add_argument("--force", action="store_true", help="Replace the output file if it already exists")
+    args = parser.parse_args()
+
+    output = args.output or f"chinook_x{args.scale}.db"
+    if os.path.exists(output):
+        if not args.force:
+            parser.error(f"{output} already exists; pass --force to replace it")
+        os.remove(output)
+
+    stats = build(output, args.scale, args.script)
+    for table, count in stats["tables"].items():
+        print(f"{table:<15}{count:>12,}")
+    print(f"Loaded {stats['rows']:,} rows in {stats['load_s']}s ({stats['rows_per_s']:,} rows/sec), "
+          f"indexes and ANALYZE in {stats['index_s']}s -> {output}")
+
+
+if __name__ == "__main__":
+    main()
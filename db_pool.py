@@ -0,0 +1,102 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Applied to every connection: memory-map the file, use a 64 MB page cache,
+# keep temp B-trees in memory, and refuse any write at the SQL level.
+DEFAULT_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+    "query_only": "ON",
+}
+
+# VM instructions between progress-handler checks
+PROGRESS_INTERVAL = 10000
+
+
+class QueryTimeout(sqlite3.OperationalError):
+    """Raised when a query is cancelled for exceeding its time or VM-step budget."""
+
+
+class ConnectionManager:
+    """Hands out one read-only SQLite connection per thread.
+
+    Connections are opened with `mode=ro`, tuned with DEFAULT_PRAGMAS and
+    guarded by a progress handler, so a runaway generated query (a cross join,
+    say) is interrupted once it exceeds the wall-clock or VM-step budget of
+    the surrounding budget() block.
+    """
+
+    def __init__(self, db_path, pragmas=None, timeout_s=10.0, max_steps=None):
+        self.db_path = db_path
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout_s = timeout_s
+        self.max_steps = max_steps
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            self._local.conn = conn
+            self._local.deadline = None
+            self._local.steps = 0
+            self._local.step_limit = None
+            conn.set_progress_handler(self._progress, PROGRESS_INTERVAL)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _progress(self):
+        state = self._local
+        state.steps += PROGRESS_INTERVAL
+        if state.deadline is not None and time.monotonic() > state.deadline:
+            return 1
+        if state.step_limit is not None and state.steps > state.step_limit:
+            return 1
+        return 0
+
+    @contextmanager
+    def budget(self, timeout_s=None, max_steps=None):
+        """Interrupt any query run by this thread inside the block once it exceeds the budget."""
+        self.connection()
+        state = self._local
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        state.deadline = time.monotonic() + timeout_s if timeout_s else None
+        state.step_limit = max_steps or self.max_steps
+        state.steps = 0
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if str(e) != "interrupted":
+                raise
+            message = (f"Query cancelled after exceeding its budget of {timeout_s}s"
+                       + (f" / {state.step_limit} VM steps" if state.step_limit else "")
+                       + "; make it cheaper, e.g. avoid cross joins and add filters or a LIMIT")
+            logging.warning(message)
+            raise QueryTimeout(message) from e
+        finally:
+            state.deadline = None
+            state.step_limit = None
+
+    def interrupt_all(self):
+        """Cancel whatever every connection is running right now."""
+        with self._lock:
+            for conn in self._connections:
+                conn.interrupt()
+
+    def close_all(self):
+        """Close every connection handed out (threads reopen on next use)."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,124 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from query_cache import normalize_question, question_tokens
+
+EXAMPLES_DB_PATH = 'examples.db'
+
+# Okapi BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over short documents given as token lists."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+        self.postings = {}
+        for n, document in enumerate(documents):
+            for token in document:
+                counts = self.postings.setdefault(token, {})
+                counts[n] = counts.get(n, 0) + 1
+        self.idf = {token: math.log(1 + (len(documents) - len(counts) + 0.5) / (len(counts) + 0.5))
+                    for token, counts in self.postings.items()}
+
+    def scores(self, query):
+        """BM25 score of every document sharing a token with the query: {document index: score}."""
+        scores = {}
+        for token in set(query):
+            for n, frequency in self.postings.get(token, {}).items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[n] / self.average_length)
+                scores[n] = scores.get(n, 0.0) + self.idf[token] * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+
+class ExampleStore:
+    """Past (question, SQL, success) pairs, with BM25 retrieval of successful ones as few-shot examples.
+
+    Every answered question is recorded in a SQLite file; a later success
+    replaces an earlier answer to the same question, a failure never replaces
+    a success. The BM25 index over successful questions lives in memory and is
+    rebuilt lazily after new successes are recorded.
+    """
+
+    def __init__(self, path=EXAMPLES_DB_PATH, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._index = None
+        self._examples = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS examples (
+                question_key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                model TEXT,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def record(self, question, sql, success=True, model=None):
+        """Store the SQL produced for a question and whether it ran successfully."""
+        if not self.enabled or not sql:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO examples VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(question_key) DO UPDATE SET question = excluded.question, sql = excluded.sql, "
+                "success = excluded.success, model = excluded.model, created_at = excluded.created_at "
+                "WHERE excluded.success OR NOT examples.success",
+                (normalize_question(question), question, sql, int(success), model, time.time()))
+            self._conn.execute(
+                "DELETE FROM examples WHERE rowid IN (SELECT rowid FROM examples ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self._conn.commit()
+            if success:
+                self._index = None
+
+    def _load(self):
+        self._examples = self._conn.execute(
+            "SELECT question_key, question, sql FROM examples WHERE success ORDER BY created_at").fetchall()
+        self._index = BM25Index([sorted(question_tokens(question)) for _, question, _ in self._examples])
+
+    def search(self, question, k=3):
+        """The k successful examples most similar to the question, as (question, sql, score), best first.
+
+        An earlier answer to the same question is skipped; the query cache already serves repeats.
+        """
+        if not self.enabled or k <= 0:
+            return []
+        key = normalize_question(question)
+        with self._lock:
+            if self._index is None:
+                self._load()
+            scores = self._index.scores(question_tokens(question))
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+            return [(self._examples[n][1], self._examples[n][2], round(score, 3))
+                    for n, score in ranked if self._examples[n][0] != key][:k]
+
+    def prompt_for(self, question, k=3):
+        """Prompt lines with the retrieved examples, or "" when there are none."""
+        examples = self.search(question, k)
+        if not examples:
+            return ""
+        logging.info(f"Retrieved {len(examples)} few-shot examples for question: {question}")
+        return ("\n\nQuestions previously answered correctly on this database:\n"
+                + "\n".join(f"Question: {example}\nSQL: {sql}" for example, sql, _ in examples))
+
+    def stats(self):
+        """Number of stored examples by outcome."""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT success, COUNT(*) FROM examples GROUP BY success").fetchall())
+        return {"successful": rows.get(1, 0), "failed": rows.get(0, 0)}
+
+    def close(self):
+        self._conn.close()
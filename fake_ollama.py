@@ -0,0 +1,127 @@
+"""Minimal stand-in for the Ollama HTTP API, for exercising the backends offline.
+
+Run it with `python fake_ollama.py --port 11434` and point the app at it with
+OLLAMA_URL, or start it in-process with start_fake_ollama(). Like Ollama it
+streams NDJSON chunks unless the request says "stream": false, emitting one
+word per `token_latency` seconds, and honours the num_predict and stop options.
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = "SELECT COUNT(*) FROM Track;"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        self.server.requests_served += 1
+        time.sleep(self.server.latency)
+        prompt = body.get("prompt", "")
+        tokens = self.tokens(self.server.respond(prompt), body.get("options") or {})
+        final = {
+            "model": body.get("model", "mistral"),
+            "done": True,
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(tokens),
+        }
+        if body.get("stream", True):
+            self.stream(tokens, final)
+            return
+        time.sleep(self.server.token_latency * len(tokens))
+        self.server.tokens_generated += len(tokens)
+        payload = json.dumps({**final, "response": "".join(tokens)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def tokens(completion, options):
+        """Split the completion into word tokens, applying the stop and num_predict options."""
+        for stop in options.get("stop") or []:
+            if stop in completion:
+                completion = completion[:completion.index(stop)]
+        tokens = re.findall(r"\S+\s*|\s+", completion)
+        return tokens[:options["num_predict"]] if options.get("num_predict") else tokens
+
+    def stream(self, tokens, final):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(self.server.token_latency)
+                self.write_chunk({"model": final["model"], "response": token, "done": False})
+                self.server.tokens_generated += 1
+            self.write_chunk({**final, "response": ""})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up once it had what it needed, so stop generating
+            self.server.streams_cancelled += 1
+            self.close_connection = True
+
+    def write_chunk(self, record):
+        data = json.dumps(record).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, response=DEFAULT_RESPONSE, latency=0.0, token_latency=0.0):
+        super().__init__(address, FakeOllamaHandler)
+        self.respond = response if callable(response) else (lambda prompt: response)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests_served = 0
+        self.tokens_generated = 0
+        self.streams_cancelled = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # Clients close streams they are done with; that is not worth a traceback
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_fake_ollama(port=0, response=DEFAULT_RESPONSE, latency=0.0, token_latency=0.0):
+    """Start a fake Ollama server on a background thread and return it.
+
+    `response` is either a fixed completion or a callable mapping the prompt
+    to a completion. Call shutdown() on the returned server when done.
+    """
+    server = FakeOllamaServer(("127.0.0.1", port), response, latency, token_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline testing")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--response", default=DEFAULT_RESPONSE, help="Completion returned for every prompt")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds to generate each word")
+    args = parser.parse_args()
+    server = FakeOllamaServer(("127.0.0.1", args.port), args.response, args.latency, args.token_latency)
+    print(f"Fake Ollama listening on {server.url}")
+    server.serve_forever()
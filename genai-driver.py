@@ -1,9 +1,7 @@
 import requests
-from pydantic import BaseModel, Field
-from langchain.llms import OpenAI
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts.chat import ChatPromptTemplate
 import json
+import os
+import xml.etree.ElementTree as ET
 from dotenv import load_dotenv
 load_dotenv()
 from pydantic.json import pydantic_encoder
@@ -11,46 +9,27 @@ import sys
 from rich import print_json
 from rich.console import Console
 from rich.syntax import Syntax
-from typing import List, Optional
+from functools import lru_cache
+from typing import Optional
 
-console = Console()
+from person_models import Person
+from xml_codec import XmlCodec, XmlCodecError, element_to_dict
 
-class Registration(BaseModel):
-    license_plate: str = Field(...)
-    registration_date: str = Field(...)
-    expiry_date: str = Field(...)
+# langchain is imported inside the LLM helpers; the XML round trip does not need it
 
-class Vehicle(BaseModel):
-    make: str = Field(...)
-    model: str = Field(...)
-    year: int = Field(...)
-    registration: Registration = Field(...)
+PERSON_CODEC = XmlCodec(Person)
 
-class Person(BaseModel):
-    name: str = Field(...)
-    address: str = Field(...)
-    email: str = Field(...)
-    alias: str = Field(...)
-    vehicles: List[Vehicle] = Field(...)  # A list of Vehicle objects
-
-    class Config:
-        json_encoders = {
-            # Your custom encoders if needed, for example:
-            # datetime: lambda v: v.isoformat(),
-        }
+LEGACY_URL = os.getenv("LEGACY_URL", "http://127.0.0.1:5001")
 
-    def to_json(self):
-        # Use model_dump() to get the model's data as a dict
-        model_dict = self.model_dump(by_alias=True)
-        # Use json.dumps() to convert the dict to a JSON string
-        return json.dumps(model_dict)
-        #return self.json()
+# Records per /persons request, and bytes of XML gathered before each write to the socket
+BATCH_SIZE = 1000
+STREAM_CHUNK_BYTES = 64 * 1024
 
-    @classmethod
-    def from_json(cls, json_data):
-        return cls(**json.loads(json_data))
+console = Console()
 
 def parse_natural_language_to_json(natural_language_str: str) -> Optional[str]:
+    from langchain.chat_models import ChatOpenAI
+    from langchain.prompts.chat import ChatPromptTemplate
     chat = ChatOpenAI(temperature=0.7, model_name="gpt-3.5-turbo-0301")
     json_translate_str = """You are a JSON assistant. Convert this natural language description to JSON. 
     Here are the classes you should use. Ensure that the JSON you generate follows the schema of these classes:
@@ -81,17 +60,87 @@ class Person(BaseModel):
     response = chat(json_translate_messages)
     return response.content
 
-def communicate_with_legacy_api(json_payload: str, show_xml=True):
-    headers = {'Content-Type': 'application/xml'}
-    xml_payload = json_to_xml_with_llm(json_payload)
+@lru_cache(maxsize=None)
+def get_legacy_session():
+    """Keep-alive HTTP session reused for every legacy app request."""
+    session = requests.Session()
+    session.headers['Content-Type'] = 'application/xml'
+    return session
+
+def communicate_with_legacy_api(json_payload, show_xml=True, llm_fallback=False, batch_size=BATCH_SIZE):
+    """Send one Person (a JSON string) to /person, or a list of them to /persons in batches.
+
+    Returns the legacy app's reply as JSON, or for a list the replies of
+    every batch as a JSON list; None if a request failed.
+    """
+    if isinstance(json_payload, list):
+        return communicate_batches_with_legacy_api(json_payload, llm_fallback, batch_size)
+    xml_payload = json_to_xml(json_payload, llm_fallback)
     if show_xml:
         print("XML Response Payload:")
         syntax = Syntax(xml_payload, "xml", theme="monokai", line_numbers=True)
         console.print(syntax)  # Optionally print the XML payload
-    response = requests.post('http://127.0.0.1:5001/person', data=xml_payload, headers=headers)
-    return xml_to_json_with_llm(response.content) if response.ok else None
+    response = get_legacy_session().post(f'{LEGACY_URL}/person', data=xml_payload)
+    return xml_to_json(response.content, llm_fallback) if response.ok else None
+
+def persons_body(json_payloads, llm_fallback=False):
+    """Stream a <Persons> document, encoding records as the upload proceeds."""
+    buffer = [b"<Persons>"]
+    size = 0
+    for json_payload in json_payloads:
+        record = json_to_xml(json_payload, llm_fallback).encode()
+        buffer.append(record)
+        size += len(record)
+        if size >= STREAM_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    buffer.append(b"</Persons>")
+    yield b"".join(buffer)
+
+def communicate_batches_with_legacy_api(json_payloads, llm_fallback=False, batch_size=BATCH_SIZE):
+    replies = []
+    for start in range(0, len(json_payloads), batch_size):
+        batch = json_payloads[start:start + batch_size]
+        body = persons_body(batch, llm_fallback)
+        if len(batch) * 1024 < STREAM_CHUNK_BYTES:
+            # Small batches go out in one write with a Content-Length instead of chunked
+            body = b"".join(body)
+        response = get_legacy_session().post(f'{LEGACY_URL}/persons', data=body)
+        if not response.ok:
+            return None
+        replies.append(json.loads(xml_to_json(response.content, llm_fallback)))
+    return json.dumps(replies)
+
+def json_to_xml(json_payload: str, llm_fallback=False):
+    """Encode Person JSON with the schema-driven codec; the LLM is only asked when opted in and the JSON does not fit."""
+    try:
+        return PERSON_CODEC.encode(Person.from_json(json_payload))
+    except ValueError:
+        if not llm_fallback:
+            raise
+        return json_to_xml_with_llm(json_payload)
+
+def xml_to_json(xml_content, llm_fallback=False):
+    """Decode a Person document with the codec, or any other well-formed XML into plain nested JSON."""
+    try:
+        element = ET.fromstring(xml_content)
+    except ET.ParseError:
+        if not llm_fallback:
+            raise
+        return xml_to_json_with_llm(xml_content)
+    if element.tag == PERSON_CODEC.tag:
+        try:
+            return PERSON_CODEC.from_element(element).to_json()
+        except XmlCodecError:
+            # A <Person> that does not match the model is an unknown shape too
+            if not llm_fallback:
+                raise
+            return xml_to_json_with_llm(xml_content)
+    return json.dumps(element_to_dict(element))
 
 def json_to_xml_with_llm(json_payload: str):
+    from langchain.chat_models import ChatOpenAI
+    from langchain.prompts.chat import ChatPromptTemplate
     chat = ChatOpenAI(temperature=0.0, model_name="gpt-3.5-turbo-0301")
     xml_translate_str = """You are an XML and JSON conversion bot. Convert this JSON to XML. Add some data (xml nodes) in there that looks like something a mainframe app would need. JSON: {json_input}"""
 
@@ -101,6 +150,8 @@ def json_to_xml_with_llm(json_payload: str):
     return response.content
 
 def xml_to_json_with_llm(xml_content: str):
+    from langchain.chat_models import ChatOpenAI
+    from langchain.prompts.chat import ChatPromptTemplate
     chat = ChatOpenAI(temperature=0.4)
     json_translate_str = """You are a JSON assistant. Convert this XML to JSON. XML: {xml_input}"""
 
@@ -112,6 +163,7 @@ def xml_to_json_with_llm(xml_content: str):
 def main():
     person = None
     show_xml = '--show-xml' in sys.argv  # Check if --show-xml is in the command line arguments
+    llm_fallback = '--llm-fallback' in sys.argv  # Let the LLM convert payloads the codec cannot
     
     natural_language_input = "\nJohn Doe lives at 123 Main St, his email is johndoe@example.com, his alias is JD. He has a 2020 Toyota Camry with license plate XYZ 1234, registered on 2020-01-01 and expiry on 2025-01-01."
     print(f"Natural Language Input: {natural_language_input}\n")
@@ -150,7 +202,7 @@ def main():
     """
 
     #person = Person.from_json(json.dumps(user_input_json))
-    response_json = communicate_with_legacy_api(person.to_json(), True)
+    response_json = communicate_with_legacy_api(person.to_json(), show_xml, llm_fallback)
     response_dict = json.loads(response_json)
 
     if response_json:
@@ -0,0 +1,311 @@
+"""Suggest indexes for the SQL the app has actually run.
+
+Usage: python index_advisor.py [--workload workload.jsonl] [--db Chinook.db] [--apply chinook_indexed.db]
+
+Every successfully executed query is appended to the workload log. The
+advisor replays the distinct queries through EXPLAIN QUERY PLAN, looks for
+full table scans, automatic indexes and temp B-tree sorts, and proposes
+covering indexes for them. Nothing is changed unless --apply is given, in
+which case the database is copied, the indexes are created on the copy, and
+the workload is timed before and after.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from db_pool import ConnectionManager
+from result_cache import canonicalize_sql
+from schema_model import SchemaModel
+from sql_validation import tokenize, unquote
+
+WORKLOAD_PATH = 'workload.jsonl'
+
+# Wider indexes cost more to maintain than they save on Chinook-sized tables
+MAX_INDEX_COLUMNS = 5
+
+# Tables this small fit in a handful of pages; scanning them is as cheap as a lookup
+MIN_TABLE_ROWS = 300
+
+CLAUSES = {"SELECT", "FROM", "JOIN", "ON", "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT"}
+EQUALITY_OPERATORS = {"=", "IN", "IS"}
+RANGE_OPERATORS = {"<", ">", "BETWEEN"}
+PLAN_PATTERN = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?P<alias>\S+)(?: USING (?P<automatic>AUTOMATIC )?(?:COVERING )?INDEX ?(?P<index>\w*))?(?: \((?P<keys>.*)\))?")
+
+
+class WorkloadLog:
+    """Appends every successfully executed query to a JSONL file for the index advisor."""
+
+    def __init__(self, path=WORKLOAD_PATH):
+        self.path = path
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed_ms, cached=False):
+        if not self.enabled:
+            return
+        line = json.dumps({"sql": sql, "elapsed_ms": round(elapsed_ms, 3), "cached": cached, "time": round(time.time(), 3)})
+        with self._lock, open(self.path, 'a') as file:
+            file.write(line + "\n")
+
+
+def read_workload(path):
+    """Group the logged queries by canonical SQL: {canonical: {"sql", "count"}} in first-seen order."""
+    workload = {}
+    with open(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            sql = json.loads(line)["sql"]
+            entry = workload.setdefault(canonicalize_sql(sql), {"sql": sql, "count": 0})
+            entry["count"] += 1
+    return workload
+
+
+def column_usage(sql, schema_model):
+    """Work out which table columns a query filters, groups, sorts and reads.
+
+    Returns ({alias: table}, {table: usage}), where usage holds ordered lists
+    under "equality", "range", "group", "order" (WHERE/GROUP BY/ORDER BY) and
+    "join" (ON), plus "all" for every column referenced. Bare column names
+    are attributed only when exactly one table in the query has them.
+    """
+    tokens = [(kind, value) for kind, value in tokenize(sql) if not value.isspace()]
+    aliases = {}
+    for n, (kind, value) in enumerate(tokens[:-1]):
+        if value.upper() not in ("FROM", "JOIN") or tokens[n + 1][0] not in ("word", "quoted"):
+            continue
+        table = next((name for name in schema_model.tables if name.lower() == unquote(tokens[n + 1][1]).lower()), None)
+        if table is None:
+            continue
+        aliases[table.lower()] = table
+        position = n + 2
+        if position < len(tokens) and tokens[position][1].upper() == "AS":
+            position += 1
+        if position < len(tokens) and tokens[position][0] == "word" and tokens[position][1].upper() not in CLAUSES | {
+                "INNER", "LEFT", "CROSS", "NATURAL", "OUTER", "USING"}:
+            aliases[tokens[position][1].lower()] = table
+
+    columns = {table: {column.lower(): column for column, _, _ in schema_model.tables[table].columns}
+               for table in set(aliases.values())}
+    usage = {table: {"equality": [], "range": [], "group": [], "order": [], "join": [], "all": []} for table in columns}
+
+    def add(table, kind, column):
+        if column not in usage[table][kind]:
+            usage[table][kind].append(column)
+
+    clause = None
+    for n, (kind, value) in enumerate(tokens):
+        upper = value.upper()
+        if kind == "word" and upper in CLAUSES:
+            clause = upper
+            continue
+        if kind not in ("word", "quoted") or (n + 1 < len(tokens) and tokens[n + 1][1] == "."):
+            continue
+        name = unquote(value).lower()
+        if n >= 2 and tokens[n - 1][1] == ".":
+            table = aliases.get(unquote(tokens[n - 2][1]).lower())
+            owners = [table] if table and name in columns[table] else []
+        else:
+            owners = [table for table in columns if name in columns[table]]
+        if len(owners) != 1:
+            continue
+        table = owners[0]
+        column = columns[table][name]
+        add(table, "all", column)
+        following = tokens[n + 1][1].upper() if n + 1 < len(tokens) else ""
+        if clause == "WHERE":
+            if following in EQUALITY_OPERATORS:
+                add(table, "equality", column)
+            elif following in RANGE_OPERATORS or following[:1] in ("<", ">"):
+                add(table, "range", column)
+        elif clause == "ON" and following == "=":
+            add(table, "join", column)
+        elif clause == "GROUP":
+            add(table, "group", column)
+        elif clause == "ORDER":
+            add(table, "order", column)
+    return aliases, usage
+
+
+def existing_indexes(conn):
+    """Column lists of every index (including primary keys) per table, for tables worth indexing."""
+    indexes = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        if conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] < MIN_TABLE_ROWS:
+            continue
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5]]
+        indexes[table] = [columns] if columns else []
+        for row in conn.execute(f'PRAGMA index_list("{table}")'):
+            indexes[table].append([info[2] for info in conn.execute(f'PRAGMA index_info("{row[1]}")')])
+    return indexes
+
+
+def _covered(columns, indexes):
+    return any(index[:len(columns)] == columns for index in indexes)
+
+
+def plan_issues(sql, conn):
+    """EXPLAIN QUERY PLAN details that point at missing indexes."""
+    details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    return [detail for detail in details
+            if detail.startswith("SCAN ") and "COVERING INDEX" not in detail
+            or "AUTOMATIC" in detail or detail.startswith("USE TEMP B-TREE")]
+
+
+def candidate_index(table, keys, usage):
+    """Key columns first, then the query's other columns so the index covers it when it fits."""
+    columns = list(keys)
+    extra = [column for column in usage["all"] if column not in columns]
+    if len(columns) + len(extra) <= MAX_INDEX_COLUMNS:
+        columns += extra
+    return columns
+
+
+def advise(sql, conn, schema_model, indexes):
+    """Return (plan issues, [(table, columns)]) for one query."""
+    issues = plan_issues(sql, conn)
+    if not issues:
+        return [], []
+    aliases, usage = column_usage(sql, schema_model)
+    sorts = any(issue.startswith("USE TEMP B-TREE") for issue in issues)
+    candidates = []
+    for issue in issues:
+        match = PLAN_PATTERN.match(issue)
+        if not match:
+            continue
+        table = aliases.get(match.group("alias").lower())
+        if table not in indexes:
+            continue
+        used = usage[table]
+        if match.group("automatic"):
+            keys = re.findall(r"(\w+)=\?", match.group("keys") or "")
+        else:
+            keys = list(used["equality"])
+            sort_columns = used["group"] or used["order"]
+            if sorts and sort_columns and len(usage) == 1:
+                keys += [column for column in sort_columns if column not in keys]
+            elif used["range"]:
+                keys.append(used["range"][0])
+        if not keys:
+            continue
+        columns = candidate_index(table, keys, used)
+        if not _covered(columns, indexes[table]):
+            candidates.append((table, columns))
+    return issues, candidates
+
+
+def merge_candidates(candidates):
+    """Drop candidates that are a prefix of another candidate on the same table."""
+    unique = []
+    for table, columns in candidates:
+        if (table, columns) not in unique:
+            unique.append((table, columns))
+    return [(table, columns) for table, columns in unique
+            if not any(other_table == table and len(other) > len(columns) and other[:len(columns)] == columns
+                       for other_table, other in unique)]
+
+
+def index_ddl(table, columns):
+    name = "IX_" + table + "_" + "_".join(columns)
+    return f"CREATE INDEX [{name}] ON [{table}] ({', '.join(f'[{column}]' for column in columns)})"
+
+
+def time_workload(workload, connections, repeat):
+    """Best-of-`repeat` wall time in ms for each distinct query; queries that fail are left out."""
+    timings = {}
+    conn = connections.connection()
+    for key, entry in workload.items():
+        best = None
+        try:
+            for _ in range(repeat):
+                began = time.perf_counter()
+                with connections.budget():
+                    conn.execute(entry["sql"]).fetchall()
+                elapsed = (time.perf_counter() - began) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+        except sqlite3.Error as e:
+            logging.warning(f"Skipping query that cannot be timed: {e}")
+            continue
+        timings[key] = best
+    return timings
+
+
+def apply_indexes(db_path, copy_path, statements):
+    """Copy the database to copy_path and create the indexes there; the original is never written."""
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    target = sqlite3.connect(copy_path)
+    source.backup(target)
+    source.close()
+    for statement in statements:
+        target.execute(statement)
+    target.execute("ANALYZE")
+    target.commit()
+    target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose indexes for the logged query workload")
+    parser.add_argument("--workload", default=WORKLOAD_PATH, help="Workload log written by the app (default: workload.jsonl)")
+    parser.add_argument("--db", default="Chinook.db", help="Database the workload ran against (default: Chinook.db)")
+    parser.add_argument("--apply", metavar="COPY",
+                        help="Copy the database to COPY, create the proposed indexes there and time the workload before and after")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per query, best kept (default: 5)")
+    args = parser.parse_args()
+
+    workload = read_workload(args.workload)
+    pool = ConnectionManager(args.db, timeout_s=60.0)
+    conn = pool.connection()
+    schema_model = SchemaModel.from_connection(conn)
+    indexes = existing_indexes(conn)
+
+    candidates = []
+    plannable = {}
+    for key, entry in workload.items():
+        try:
+            issues, proposed = advise(entry["sql"], conn, schema_model, indexes)
+        except sqlite3.Error as e:
+            logging.warning(f"Skipping query the advisor cannot plan: {e}")
+            continue
+        plannable[key] = entry
+        if issues:
+            print(f"[{entry['count']}x] {entry['sql']}")
+            for issue in issues:
+                print(f"    {issue}")
+        candidates += proposed
+
+    statements = [index_ddl(table, columns) for table, columns in merge_candidates(candidates)]
+    print(f"\n{len(workload)} distinct queries, {len(statements)} proposed indexes")
+    for statement in statements:
+        print(f"  {statement};")
+    if not args.apply or not statements:
+        return
+
+    if os.path.abspath(args.apply) == os.path.abspath(args.db):
+        parser.error("--apply must name a copy, not the database itself")
+    before = time_workload(plannable, pool, args.repeat)
+    pool.close_all()
+    apply_indexes(args.db, args.apply, statements)
+    copy_pool = ConnectionManager(args.apply, timeout_s=60.0)
+    after = time_workload(plannable, copy_pool, args.repeat)
+    copy_pool.close_all()
+
+    print(f"\nIndexes created on {args.apply}. Best of {args.repeat} runs per query:")
+    print(f"{'count':>6} {'before ms':>10} {'after ms':>10} {'speedup':>8}  query")
+    timed = {key: entry for key, entry in plannable.items() if key in before and key in after}
+    for key, entry in timed.items():
+        print(f"{entry['count']:>6} {before[key]:>10.2f} {after[key]:>10.2f} {before[key] / max(after[key], 1e-6):>7.1f}x  "
+              f"{entry['sql'][:80]}")
+    total_before = sum(before[key] * entry["count"] for key, entry in timed.items())
+    total_after = sum(after[key] * entry["count"] for key, entry in timed.items())
+    print(f"Workload total: {total_before:.1f} ms -> {total_after:.1f} ms "
+          f"({total_before / max(total_after, 1e-6):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,66 @@
 from flask import Flask, request, Response
+import json
+import logging
+import os
+import random
+import time
 import xml.etree.ElementTree as ET
 
+from person_models import Person
+from xml_codec import XmlCodec, XmlCodecError
+
 app = Flask(__name__)
 
+# Fraction of successful requests logged; errors are always logged
+LOG_SAMPLE_RATE = float(os.getenv("LEGACY_LOG_SAMPLE_RATE", "0.01"))
+
+logger = logging.getLogger("legacyapp")
+person_codec = XmlCodec(Person)
+
+
+def log_event(event, sampled=True, **fields):
+    """Write one JSON log line; sampled events are kept at LOG_SAMPLE_RATE."""
+    if sampled and random.random() >= LOG_SAMPLE_RATE:
+        return
+    logger.info(json.dumps({"event": event, **fields}))
+
+
+def xml_response(tag, status=200, **children):
+    element = ET.Element(tag)
+    for name, value in children.items():
+        ET.SubElement(element, name).text = str(value)
+    return Response(ET.tostring(element, encoding='utf8').decode('utf8'), status=status, mimetype='application/xml')
+
+
 @app.route('/person', methods=['POST'])
 def person_endpoint():
     # Parse the XML from the request
+    start = time.perf_counter()
     try:
         xml_data = ET.fromstring(request.data)
-        # Process the XML data as needed, here we just print it
-        print(ET.tostring(xml_data, encoding='utf8').decode('utf8'))
-        
-        # Create a response XML data
-        response_data = ET.Element('Response')
-        message = ET.SubElement(response_data, 'Message')
-        message.text = 'Data received successfully'
-        
-        # Convert to a pretty XML string
-        response_str = ET.tostring(response_data, encoding='utf8').decode('utf8')
-        return Response(response_str, mimetype='application/xml')
+        log_event("person", tag=xml_data.tag, bytes=len(request.data),
+                  ms=round((time.perf_counter() - start) * 1000, 3))
+        return xml_response('Response', Message='Data received successfully')
     except ET.ParseError as e:
-        error_response = ET.Element('Error')
-        message = ET.SubElement(error_response, 'Message')
-        message.text = f'Invalid XML: {e}'
-        response_str = ET.tostring(error_response, encoding='utf8').decode('utf8')
-        return Response(response_str, status=400, mimetype='application/xml')
+        log_event("person_error", sampled=False, error=str(e), bytes=len(request.data))
+        return xml_response('Error', 400, Message=f'Invalid XML: {e}')
+
+
+@app.route('/persons', methods=['POST'])
+def persons_endpoint():
+    """Accept any number of <Person> records under one wrapper element, parsed as they stream in."""
+    start = time.perf_counter()
+    received = 0
+    try:
+        for _ in person_codec.iterdecode(request.stream):
+            received += 1
+    except XmlCodecError as e:
+        log_event("persons_error", sampled=False, error=str(e), received=received)
+        return xml_response('Error', 400, Message=f'Invalid record after {received} records: {e}', Received=received)
+    log_event("persons", received=received, ms=round((time.perf_counter() - start) * 1000, 3))
+    return xml_response('Response', Message='Data received successfully', Received=received)
+
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     app.run(debug=True, host='0.0.0.0', port=5001)
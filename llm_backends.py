@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+
+from tracing import annotate, span
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+# Sent with every Ollama request: cap the completion length and stop at the
+# blank line that usually separates the SQL from an explanation. The cap only
+# bounds runaway output; streaming already closes the request at the first
+# complete statement, so it is set well above the length of a long multi-join query.
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", "1024"))
+OLLAMA_OPTIONS = {"num_predict": OLLAMA_NUM_PREDICT, "stop": [";\n\n", "\n```\n\n"]}
+
+# How long Ollama keeps the model loaded after a request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+SYSTEM_PROMPT = "You are a helpful assistant that generates SQL queries."
+
+
+def build_prompt(schema, question, error_message=None):
+    """Build the SQL generation prompt shared by every backend."""
+    prompt = f"""Given the following SQLite database schema:
+
+    {schema}
+
+    Generate a SQL query to answer the following question:
+    {question}
+
+    Provide only the SQL query without any explanation."""
+
+    if error_message:
+        prompt += f"\n\nThe previous query resulted in the following error: {error_message}\nPlease correct the query."
+    return prompt
+
+
+def ollama_payload(model, prompt):
+    """Streaming /api/generate request body shared by the sync and async Ollama clients."""
+    return {"model": model, "prompt": prompt, "stream": True, "options": OLLAMA_OPTIONS, "keep_alive": OLLAMA_KEEP_ALIVE}
+
+
+def complete_sql(text):
+    """Return the completion cut after its first complete SQL statement, or None if there is none yet.
+
+    A statement ends at a closing markdown fence, or at a `;` that
+    sqlite3.complete_statement accepts after a SELECT or WITH.
+    """
+    fence = text.find("```")
+    start = 0
+    if fence >= 0:
+        start = text.find("\n", fence)
+        if start < 0:
+            return None
+        close = text.find("```", start)
+        if close >= 0:
+            return text[:close + 3]
+    position = text.find(";", start)
+    while position >= 0:
+        statement = text[start:position + 1]
+        if re.search(r"\b(?:SELECT|WITH)\b", statement, re.IGNORECASE) and sqlite3.complete_statement(statement):
+            return text[:position + 1]
+        position = text.find(";", position + 1)
+    return None
+
+
+class OllamaStream:
+    """Assembles streamed /api/generate chunks and reports when the SQL is complete.
+
+    Feed it the NDJSON lines as they arrive; feed() returns True once a
+    complete statement (or the end of the stream) has been seen, at which
+    point the caller should close the response so Ollama stops generating.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.chunks = 0
+        self.text = None
+        self.done = False
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def feed(self, line):
+        if not line or not line.strip():
+            return False
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise RuntimeError(f"Ollama error: {chunk['error']}")
+        self.chunks += 1
+        piece = chunk.get("response", "")
+        self.parts.append(piece)
+        if chunk.get("done"):
+            self.done = True
+            self.prompt_tokens = chunk.get("prompt_eval_count")
+            self.completion_tokens = chunk.get("eval_count")
+            self.text = "".join(self.parts)
+            return True
+        if ";" in piece or "`" in piece:
+            self.text = complete_sql("".join(self.parts))
+        return self.text is not None
+
+    @property
+    def stopped_early(self):
+        return self.text is not None and not self.done
+
+    def result(self):
+        text = self.text if self.text is not None else "".join(self.parts)
+        annotate(prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens or self.chunks,
+                 early_stop=self.stopped_early)
+        return text.strip()
+
+
+class LLMBackend(ABC):
+    """Async LLM backend with a per-backend concurrency limit and timeout."""
+
+    def __init__(self, model, max_concurrency=4, timeout=60.0):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, prompt):
+        """Return the model's completion for the prompt."""
+        async with self._semaphore:
+            with span("llm.generate", model=self.model):
+                text = await asyncio.wait_for(self._generate(prompt), self.timeout)
+        logging.info(f"{self.model} generated SQL query: {text}")
+        return text
+
+    @abstractmethod
+    async def _generate(self, prompt):
+        ...
+
+    async def aclose(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama /api/generate over a shared keep-alive httpx connection pool.
+
+    The completion is streamed and the request closed as soon as it holds a
+    complete SQL statement, so explanations after the query are never waited for.
+    """
+
+    def __init__(self, model="mistral", base_url=OLLAMA_URL, max_concurrency=2, timeout=120.0):
+        super().__init__(model, max_concurrency, timeout)
+        import httpx
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency))
+
+    async def _generate(self, prompt):
+        stream = OllamaStream()
+        async with self._client.stream("POST", "/api/generate", json=ollama_payload(self.model, prompt)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if stream.feed(line):
+                    break
+        return stream.result()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions through a single AsyncOpenAI client."""
+
+    def __init__(self, model="gpt-3.5-turbo", api_key=None, max_concurrency=8, timeout=60.0):
+        super().__init__(model, max_concurrency, timeout)
+        from openai import AsyncOpenAI
+
+        self._client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), timeout=timeout)
+
+    async def _generate(self, prompt):
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        if response.usage:
+            annotate(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
+        return response.choices[0].message.content.strip()
+
+    async def aclose(self):
+        await self._client.close()
+
+
+def create_backend(model, **kwargs):
+    """Create the backend for a --model choice."""
+    if model == "mistral":
+        return OllamaBackend(model, **kwargs)
+    return OpenAIBackend(model, **kwargs)
+
+
+async def generate_many(backend, prompts):
+    """Generate completions for many prompts concurrently.
+
+    Results come back in prompt order; a failed prompt yields its exception
+    instead of cancelling the rest of the batch.
+    """
+    return await asyncio.gather(*(backend.generate(prompt) for prompt in prompts), return_exceptions=True)
+
+
+QUESTION_PATTERN = re.compile(r"answer the following question:\s*(.*?)\s*Provide only the SQL query", re.DOTALL)
+
+
+def prompt_question(prompt):
+    """Recover the question from a prompt made by build_prompt."""
+    match = QUESTION_PATTERN.search(prompt)
+    return match.group(1) if match else prompt
+
+
+class ReplayBackend(LLMBackend):
+    """Deterministic backend that returns canned SQL after a simulated latency.
+
+    `responses` maps a question to either a SQL string or a list of SQL
+    strings returned on successive calls (the last one repeats), which lets a
+    corpus script a wrong first answer to exercise the retry path.
+    """
+
+    def __init__(self, responses, model="replay", latency=0.0, jitter=0.0, seed=0,
+                 default="SELECT 1", max_concurrency=64, timeout=60.0):
+        super().__init__(model, max_concurrency, timeout)
+        self.responses = responses
+        self.latency = latency
+        self.jitter = jitter
+        self.default = default
+        self._random = random.Random(seed)
+        self._calls = {}
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        """Load {"question": ..., "replay": [...] or "sql": ...} records.
+
+        Answers for a question repeated over several records (as written by
+        RecordingBackend, one per attempt) are replayed in file order.
+        """
+        responses = {}
+        with open(path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    responses.setdefault(record["question"], []).extend(record.get("replay") or [record["sql"]])
+        return cls(responses, **kwargs)
+
+    async def _generate(self, prompt):
+        question = prompt_question(prompt)
+        call = self._calls.get(question, 0)
+        self._calls[question] = call + 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        answer = self.responses.get(question, self.default)
+        if isinstance(answer, list):
+            answer = answer[min(call, len(answer) - 1)]
+        annotate(prompt_tokens=len(prompt) // 4, completion_tokens=len(answer) // 4)
+        return answer
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps a live backend and appends every answer to a JSONL file ReplayBackend can load."""
+
+    def __init__(self, backend, path):
+        super().__init__(backend.model, backend.max_concurrency, backend.timeout)
+        self.backend = backend
+        self.path = path
+
+    async def _generate(self, prompt):
+        answer = await self.backend._generate(prompt)
+        with open(self.path, 'a') as file:
+            file.write(json.dumps({"question": prompt_question(prompt), "sql": answer}) + "\n")
+        return answer
+
+    async def aclose(self):
+        await self.backend.aclose()
@@ -0,0 +1,43 @@
+"""Pydantic models exchanged between genai-driver.py and the legacy app."""
+import json
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class Registration(BaseModel):
+    license_plate: str = Field(...)
+    registration_date: str = Field(...)
+    expiry_date: str = Field(...)
+
+
+class Vehicle(BaseModel):
+    make: str = Field(...)
+    model: str = Field(...)
+    year: int = Field(...)
+    registration: Registration = Field(...)
+
+
+class Person(BaseModel):
+    name: str = Field(...)
+    address: str = Field(...)
+    email: str = Field(...)
+    alias: str = Field(...)
+    vehicles: List[Vehicle] = Field(...)  # A list of Vehicle objects
+
+    class Config:
+        json_encoders = {
+            # Your custom encoders if needed, for example:
+            # datetime: lambda v: v.isoformat(),
+        }
+
+    def to_json(self):
+        # Use model_dump() to get the model's data as a dict
+        model_dict = self.model_dump(by_alias=True)
+        # Use json.dumps() to convert the dict to a JSON string
+        return json.dumps(model_dict)
+        #return self.json()
+
+    @classmethod
+    def from_json(cls, json_data):
+        return cls(**json.loads(json_data))
@@ -0,0 +1,179 @@
+import difflib
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_DB_PATH = 'query_cache.db'
+
+# Words that carry no meaning for matching two questions against each other
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "and", "or", "is", "are",
+    "was", "were", "be", "me", "my", "i", "we", "our", "you", "please", "show", "list",
+    "give", "tell", "what", "which", "who", "there", "do", "does", "with", "from", "all",
+}
+
+
+def normalize_question(question):
+    """Lower-case a question and strip punctuation and repeated whitespace."""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def question_words(question):
+    """Return the meaningful, crudely singularized words of a question in order."""
+    words = []
+    for word in normalize_question(question).split():
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def question_tokens(question):
+    """Return the set of meaningful, crudely singularized words in a question."""
+    return set(question_words(question))
+
+
+def token_similarity(a, b):
+    """Jaccard similarity between two token sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def question_similarity(a, b):
+    """Similarity of two word sequences: the lower of their Jaccard and sequence-match scores.
+
+    The sequence ratio keeps word order significant, so "artists with the most
+    albums" and "albums with the most artists" do not match.
+    """
+    if not a or not b:
+        return 0.0
+    return min(token_similarity(set(a), set(b)), difflib.SequenceMatcher(None, a, b).ratio())
+
+
+class QueryCache:
+    """Persistent question -> SQL cache stored in a SQLite file.
+
+    Entries are keyed on the normalized question, the model name and a hash of
+    the introspected schema text plus the resolved database path, so switching
+    databases or changing the live schema makes every older entry unreachable
+    (they are purged on the next lookup). Near-duplicate questions can be served
+    through an order-aware word similarity tier, and entries are evicted by TTL and LRU.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, schema_text="", db_path="", max_entries=1000,
+                 ttl_seconds=7 * 24 * 3600, similarity_threshold=0.9):
+        self.path = path
+        self._schema_hash = hashlib.sha256(
+            f"{os.path.realpath(db_path) if db_path else ''}\n{schema_text}".encode()).hexdigest()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache (
+                question_key TEXT NOT NULL,
+                schema_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                question TEXT NOT NULL,
+                tokens TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (question_key, schema_hash, model)
+            )""")
+        self._conn.commit()
+
+    def schema_hash(self):
+        """Hash of the database path and schema text the cached SQL was generated against."""
+        return self._schema_hash
+
+    def _expire(self, schema_hash):
+        """Drop entries built against another schema or older than the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        deleted = self._conn.execute(
+            "DELETE FROM query_cache WHERE schema_hash != ? OR created_at < ?",
+            (schema_hash, cutoff)).rowcount
+        if deleted:
+            logging.info(f"Query cache expired {deleted} entries")
+
+    def get(self, question, model):
+        """Return cached SQL for the question, or None on a miss."""
+        key = normalize_question(question)
+        schema_hash = self.schema_hash()
+        with self._lock:
+            self._expire(schema_hash)
+            row = self._conn.execute(
+                "SELECT question_key, sql FROM query_cache WHERE question_key = ? AND schema_hash = ? AND model = ?",
+                (key, schema_hash, model)).fetchone()
+            if row:
+                self.exact_hits += 1
+                kind = "exact"
+            elif self.similarity_threshold:
+                row = self._most_similar(question, schema_hash, model)
+                if row:
+                    self.similar_hits += 1
+                    kind = "similar"
+            if not row:
+                self.misses += 1
+                self._conn.commit()
+                logging.info(f"Query cache miss for question: {question}")
+                return None
+            self._conn.execute(
+                "UPDATE query_cache SET last_used = ?, hits = hits + 1 WHERE question_key = ? AND schema_hash = ? AND model = ?",
+                (time.time(), row[0], schema_hash, model))
+            self._conn.commit()
+        logging.info(f"Query cache {kind} hit for question: {question}")
+        return row[1]
+
+    def _most_similar(self, question, schema_hash, model):
+        words = question_words(question)
+        best, best_score = None, 0.0
+        for question_key, cached_words, sql in self._conn.execute(
+                "SELECT question_key, tokens, sql FROM query_cache WHERE schema_hash = ? AND model = ?",
+                (schema_hash, model)):
+            score = question_similarity(words, cached_words.split())
+            if score > best_score:
+                best, best_score = (question_key, sql), score
+        return best if best_score >= self.similarity_threshold else None
+
+    def put(self, question, model, sql):
+        """Store SQL that answered the question successfully."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (normalize_question(question), self.schema_hash(), model, question,
+                 " ".join(question_words(question)), sql, now, now))
+            self._conn.execute(
+                "DELETE FROM query_cache WHERE rowid IN (SELECT rowid FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM query_cache")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        hit_rate = (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0
+        return {"exact_hits": self.exact_hits, "similar_hits": self.similar_hits,
+                "misses": self.misses, "hit_rate": round(hit_rate, 3)}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,216 @@
+import io
+import re
+import threading
+import textwrap
+
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}")
+ISO_DATE = re.compile(r"^\d{4}-\d{2}(-\d{2})?([ T]\d{2}:\d{2}(:\d{2})?)?$")
+
+# Charts show at most this many bars (the rest are summed into "Other"),
+# line points or histogram bins, and this many value columns
+MAX_CATEGORIES = 20
+MAX_POINTS = 200
+MAX_SERIES = 5
+
+
+def _format_datetimes(values):
+    """Format datetimes, dropping the time part when every value is at midnight."""
+    if (values.dropna() == values.dropna().dt.normalize()).all():
+        return values.dt.strftime("%Y-%m-%d")
+    return values.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_column(series):
+    """Convert a whole column to display strings in one vectorized pass.
+
+    Returns (list of strings, justify) where numeric columns are right-aligned.
+    """
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(series):
+        text, justify = series.astype(str).to_numpy(), "left"
+    elif pd.api.types.is_integer_dtype(series):
+        text, justify = series.astype(str).to_numpy(), "right"
+    elif pd.api.types.is_float_dtype(series):
+        values = np.where(missing, 0.0, series.to_numpy(dtype=float, na_value=np.nan))
+        # Exact check: a relative tolerance would print 199999.7 as 199999
+        if np.isfinite(values).all() and np.array_equal(values, np.round(values)):
+            text = np.char.mod("%.0f", np.round(values) + 0.0)
+        else:
+            # Two decimals suit prices and averages but would print 0.0049 as 0.00
+            small = (np.abs(values) < 0.01) & (values != 0)
+            text = np.where(small, np.char.mod("%g", values), np.char.mod("%.2f", values))
+        justify = "right"
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        text, justify = _format_datetimes(series).to_numpy(), "left"
+    else:
+        first = series.dropna().head(1)
+        parsed = None
+        if len(first) and isinstance(first.iloc[0], str) and ISO_DATETIME.match(first.iloc[0]):
+            parsed = pd.to_datetime(series, errors="coerce")
+            if parsed.isna().to_numpy().sum() != missing.sum():
+                parsed = None
+        if parsed is not None:
+            text = _format_datetimes(parsed).to_numpy()
+        else:
+            text = series.astype(str).to_numpy()
+        justify = "left"
+    text = np.asarray(text, dtype=object)
+    text[missing] = ""
+    return text.tolist(), justify
+
+
+def build_table(title, df):
+    """Build a Rich table from a DataFrame column by column instead of row by row."""
+    table = Table(title=title)
+    columns = []
+    for name in df.columns:
+        text, justify = format_column(df[name])
+        table.add_column(str(name), style="cyan", justify=justify)
+        columns.append(text)
+    for row in zip(*columns):
+        table.add_row(*row)
+    return table
+
+
+def _parse_dates(series):
+    """The column as datetimes if it holds dates (or ISO date strings), else None."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    first = series.dropna().head(1)
+    if not len(first) or not isinstance(first.iloc[0], str) or not ISO_DATE.match(first.iloc[0]):
+        return None
+    parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+    return parsed if parsed.isna().sum() == series.isna().sum() else None
+
+
+def _bin(x, frame, bins, how):
+    """Aggregate rows into `bins` equal-width bins of the numeric array x; returns (bin midpoints, frame)."""
+    edges = np.linspace(x.min(), x.max(), bins + 1)
+    index = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, bins - 1)
+    grouped = frame.groupby(index).agg(how)
+    return (edges[grouped.index] + edges[grouped.index + 1]) / 2, grouped
+
+
+def chart_data(df, max_categories=MAX_CATEGORIES, max_points=MAX_POINTS):
+    """Reduce a result frame to what fits on a chart.
+
+    Returns (kind, x label, x values, DataFrame of series) where kind is
+    "bar" (categories, top max_categories - 1 by the first value column plus
+    "Other"), "line" (dates or numbers on the x axis, binned to max_points)
+    or "hist" (a single numeric column). Frames without numeric columns are
+    charted as row counts per value of their first column. Infinite values
+    (which SQLite can return) are treated as missing.
+    """
+    numeric = [column for column in df.columns
+               if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])]
+    others = [column for column in df.columns if column not in numeric]
+    if not len(df.columns):
+        return "bar", "", [], pd.DataFrame()
+    floats = [column for column in numeric if pd.api.types.is_float_dtype(df[column])]
+    if floats:
+        df = df.copy()
+        df[floats] = df[floats].replace([np.inf, -np.inf], np.nan)
+
+    if not others and len(numeric) == 1:
+        values = df[numeric[0]].dropna().to_numpy(dtype=float)
+        if not len(values):
+            return "hist", str(numeric[0]), np.array([]), pd.DataFrame({"rows": []})
+        counts, edges = np.histogram(values, bins=min(max_points, max(1, int(np.sqrt(len(values))))))
+        return "hist", str(numeric[0]), edges, pd.DataFrame({"rows": counts})
+
+    if not others:
+        x_name, columns = numeric[0], numeric[1:MAX_SERIES + 1]
+        frame = df[[x_name] + columns].dropna(subset=[x_name]).sort_values(x_name)
+        x = frame[x_name].to_numpy(dtype=float)
+        if len(frame) > max_points:
+            x, series = _bin(x, frame[columns], max_points, "mean")
+            return "line", f"{x_name} (binned)", x, series
+        return "line", str(x_name), x, frame[columns].reset_index(drop=True)
+
+    x_name, columns = others[0], numeric[:MAX_SERIES]
+    if columns:
+        frame = df[[x_name] + columns]
+    else:
+        frame = df[[x_name]].assign(rows=1)
+        columns = ["rows"]
+
+    dates = _parse_dates(df[x_name])
+    if dates is not None:
+        frame = frame.assign(**{x_name: dates}).dropna(subset=[x_name])
+        series = frame.groupby(x_name)[columns].sum()
+        if len(series) > max_points:
+            stamps = series.index.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            x, series = _bin(stamps, series, max_points, "sum")
+            return "line", f"{x_name} (summed per bin)", pd.to_datetime(x.astype(np.int64)), series
+        return "line", str(x_name), series.index, series.reset_index(drop=True)
+
+    series = frame.groupby(frame[x_name].astype(str), sort=False)[columns].sum()
+    if len(series) > max_categories:
+        top = series.nlargest(max_categories - 1, columns[0])
+        rest = series.drop(top.index)
+        other = rest.sum().to_frame(f"Other ({len(rest)} more)").T
+        series = pd.concat([top, other])
+    return "bar", str(x_name), list(series.index), series.reset_index(drop=True)
+
+
+class ChartRenderer:
+    """Draws result frames headlessly with the Agg backend, reusing one figure.
+
+    Frames are reduced by chart_data first, so drawing time does not grow
+    with the row count. render() writes PNG or SVG to a path, or returns
+    the bytes when no path is given.
+    """
+
+    def __init__(self, width=10, height=6, dpi=100):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(width, height), dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self._lock = threading.Lock()
+
+    def _draw(self, title, df):
+        kind, x_label, x, series = chart_data(df)
+        axes = self.figure.add_subplot()
+        axes.set_title(textwrap.shorten(str(title), 90, placeholder="..."))
+        if not len(series) or not series.notna().to_numpy().any():
+            axes.text(0.5, 0.5, "No values to chart", ha="center", va="center", transform=axes.transAxes)
+            axes.set_axis_off()
+            return
+        if kind == "hist":
+            axes.bar(x[:-1], series["rows"], width=np.diff(x), align="edge")
+        elif kind == "bar":
+            positions = np.arange(len(x))
+            width = 0.8 / len(series.columns)
+            for n, column in enumerate(series.columns):
+                bars = axes.bar(positions + n * width - 0.4 + width / 2, series[column], width, label=str(column))
+                if str(x[-1]).startswith("Other ("):
+                    bars[-1].set_color("lightgray")
+            axes.set_xticks(positions, [textwrap.shorten(label, 24, placeholder="...") for label in x],
+                            rotation=45, ha="right")
+        else:
+            for column in series.columns:
+                axes.plot(x, series[column], label=str(column))
+        if len(series.columns) > 1:
+            axes.legend()
+        axes.set_xlabel(x_label)
+        axes.set_ylabel(str(series.columns[0]) if len(series.columns) == 1 else "value")
+        if kind == "line" and pd.api.types.is_datetime64_any_dtype(pd.Series(x)):
+            self.figure.autofmt_xdate()
+        self.figure.subplots_adjust(left=0.1, right=0.97, top=0.92, bottom=0.25 if kind == "bar" else 0.15)
+
+    def render(self, title, df, path=None, fmt=None):
+        """Draw df and save it to path (format from the extension or fmt), or return the bytes."""
+        with self._lock:
+            self.figure.clear()
+            self._draw(title, df)
+            if path is None:
+                buffer = io.BytesIO()
+                self.figure.savefig(buffer, format=fmt or "png")
+                return buffer.getvalue()
+            self.figure.savefig(path, format=fmt)
+            return path
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_DIR = '.result_cache'
+
+# Connections whose PRAGMA data_version is remembered (one per pooled thread in practice)
+MAX_TRACKED_CONNECTIONS = 64
+
+
+def canonicalize_sql(query):
+    """Collapse whitespace and lower-case SQL outside quoted literals and identifiers."""
+    parts = []
+    quote = None
+    for char in query.strip().rstrip(';').strip():
+        if quote:
+            parts.append(char)
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '`', '['):
+            parts.append(char)
+            quote = ']' if char == '[' else char
+        elif char.isspace():
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        else:
+            parts.append(char.lower())
+    return ''.join(parts)
+
+
+def encode_frame(df):
+    """Serialize a DataFrame as pickled per-column numpy blocks."""
+    payload = {
+        "columns": list(df.columns),
+        "dtypes": [str(dtype) for dtype in df.dtypes],
+        "blocks": [df.iloc[:, i].to_numpy() for i in range(df.shape[1])],
+    }
+    return pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_frame(blob):
+    """Rebuild a DataFrame serialized by encode_frame."""
+    import pandas as pd
+
+    payload = pickle.loads(blob)
+    df = pd.DataFrame({i: block for i, block in enumerate(payload["blocks"])})
+    df.columns = payload["columns"]
+    return df.astype(dict(zip(payload["columns"], payload["dtypes"]))) if len(df.columns) else df
+
+
+class ResultCache:
+    """Two-tier (memory + disk) cache of query results keyed on canonical SQL.
+
+    Every key includes a fingerprint of the database file (mtime and size),
+    and PRAGMA data_version is tracked for each connection that reads through
+    the cache, so results are dropped as soon as the data changes.
+    """
+
+    def __init__(self, db_path, cache_dir=RESULT_CACHE_DIR, max_memory_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._fingerprint = None
+        self._data_versions = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self):
+        stat = os.stat(self.db_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _data_changed(self, conn):
+        # data_version is only comparable with earlier values from the same connection.
+        # sqlite3 connections cannot be weakly referenced, so each entry holds its
+        # connection: its id cannot be reused by a new connection while it is stored.
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        owner, previous = self._data_versions.pop(id(conn), (None, None))
+        if owner is not conn:
+            previous = None
+        self._data_versions[id(conn)] = (conn, data_version)
+        while len(self._data_versions) > MAX_TRACKED_CONNECTIONS:
+            # Forget the least recently used connection; it is treated as new if it comes back
+            del self._data_versions[next(iter(self._data_versions))]
+        return previous is not None and previous != data_version
+
+    def _key(self, query, conn):
+        fingerprint = self.fingerprint()
+        file_changed = self._fingerprint is not None and fingerprint != self._fingerprint
+        if self._data_changed(conn) or file_changed:
+            logging.info("Database changed, invalidating result cache")
+            self.clear()
+        self._fingerprint = fingerprint
+        return hashlib.sha256(f"{fingerprint}\n{canonicalize_sql(query)}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, query, conn):
+        """Return the cached DataFrame for the query, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            key = self._key(query, conn)
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+            else:
+                try:
+                    with open(self._path(key), 'rb') as file:
+                        blob = file.read()
+                    self._remember(key, blob)
+                except FileNotFoundError:
+                    self.misses += 1
+                    return None
+            self.hits += 1
+        return decode_frame(blob)
+
+    def put(self, query, conn, df):
+        """Store a query result in both tiers."""
+        if not self.enabled:
+            return
+        blob = encode_frame(df)
+        with self._lock:
+            key = self._key(query, conn)
+            self._remember(key, blob)
+            if len(blob) <= self.max_disk_bytes:
+                with open(self._path(key), 'wb') as file:
+                    file.write(blob)
+                self._trim_disk()
+
+    def _remember(self, key, blob):
+        if len(blob) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = blob
+        self._memory_bytes += len(blob)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _trim_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        """Drop every cached result from both tiers."""
+        self._memory.clear()
+        self._memory_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,215 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+
+# HTTP statuses worth retrying: rate limiting and transient server trouble
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Failures below the HTTP layer that are worth retrying
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError, ConnectionError, TimeoutError)
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when every model is rate limited, failing, or behind an open circuit breaker."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens a minute.
+
+    reserve() takes tokens immediately, going into debt if needed, and returns
+    how long the caller must wait before using them. Callers therefore queue
+    up behind each other at the configured rate instead of bursting together.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """Take `amount` tokens and return the seconds to wait before they are available."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def adjust(self, amount):
+        """Give back (positive) or take (negative) tokens once the real cost of a request is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds`, e.g. when the provider sent Retry-After."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Stops calling a backend after `failure_threshold` consecutive failures.
+
+    Once open, calls are refused until `reset_timeout` seconds have passed;
+    then a single trial call is let through (half-open), which closes the
+    breaker on success and reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def release(self):
+        """Give up a call allow() let through without learning whether the backend works."""
+        with self._lock:
+            self.trial_running = False
+
+
+def retry_after_seconds(response):
+    """Seconds requested by a Retry-After header (delta seconds or an HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(parsed.timestamp() - time.time(), 0.0) if parsed else None
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter: uniform between 0 and min(cap, base * 2**attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class ModelScheduler:
+    """Paces, retries and guards calls to one model backend.
+
+    Each call reserves a request and its estimated tokens from the per-minute
+    buckets (waiting if needed), retries 429s and transient failures with
+    Retry-After-respecting exponential backoff with jitter, and reports the
+    outcome to the backend's circuit breaker. Rather than block for longer
+    than `max_wait` seconds, for capacity or for a Retry-After, and on any
+    other failure, it raises ModelUnavailableError so the caller can fall back.
+    """
+
+    def __init__(self, name, requests_per_minute=None, tokens_per_minute=None, max_attempts=4,
+                 completion_tokens=256, breaker=None, max_wait=30.0):
+        self.name = name
+        self.max_wait = max_wait
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_attempts = max_attempts
+        self.completion_tokens = completion_tokens
+        self.breaker = breaker or CircuitBreaker()
+
+    def _wait_for_capacity(self, estimate):
+        wait = max(self.requests.reserve() if self.requests else 0.0,
+                   self.tokens.reserve(estimate) if self.tokens else 0.0)
+        if wait > self.max_wait:
+            # Hand the reservation back; the caller falls back instead of blocking
+            if self.requests:
+                self.requests.adjust(1)
+            if self.tokens:
+                self.tokens.adjust(estimate)
+            raise ModelUnavailableError(f"{self.name}: rate limited for another {wait:.0f}s")
+        if wait > 0:
+            logging.info(f"{self.name}: rate limit reached, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    def call(self, generate, input_text):
+        """Return generate(input_text), or raise once the attempts are used up or the breaker is open."""
+        if not self.breaker.allow():
+            raise ModelUnavailableError(f"{self.name}: circuit breaker is {self.breaker.state}")
+        estimate = estimate_tokens(input_text) + self.completion_tokens
+        for attempt in range(self.max_attempts):
+            try:
+                self._wait_for_capacity(estimate)
+            except ModelUnavailableError:
+                self.breaker.release()
+                raise
+            try:
+                text = generate(input_text)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRYABLE_STATUSES:
+                    # The backend is up; the request itself was rejected
+                    self.breaker.record_success()
+                    raise
+                delay = retry_after_seconds(e.response)
+                if delay is not None:
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.pause(delay)
+                    if delay > self.max_wait:
+                        self.breaker.release()
+                        raise ModelUnavailableError(f"{self.name}: asked to retry after {delay:.0f}s") from e
+                    delay += random.uniform(0, 0.1 * delay + 0.05)
+                else:
+                    delay = backoff_delay(attempt)
+                error = e
+            except TRANSIENT_ERRORS as e:
+                delay = backoff_delay(attempt)
+                error = e
+            except Exception as e:
+                self.breaker.record_failure()
+                raise ModelUnavailableError(f"{self.name}: {type(e).__name__}: {e}") from e
+            else:
+                if self.tokens:
+                    self.tokens.adjust(estimate - estimate_tokens(input_text) - estimate_tokens(text))
+                self.breaker.record_success()
+                return text
+            if attempt < self.max_attempts - 1:
+                logging.warning(f"{self.name}: attempt {attempt + 1} failed ({error}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+        self.breaker.record_failure()
+        raise ModelUnavailableError(f"{self.name}: gave up after {self.max_attempts} attempts: {error}") from error
@@ -0,0 +1,157 @@
+import re
+from collections import deque
+
+# Question words that point at a table even though they never appear in its name
+SYNONYMS = {
+    "sale": ["InvoiceLine", "Invoice"],
+    "sold": ["InvoiceLine", "Invoice"],
+    "selling": ["InvoiceLine", "Invoice"],
+    "seller": ["InvoiceLine", "Invoice"],
+    "revenue": ["InvoiceLine", "Invoice"],
+    "purchase": ["InvoiceLine", "Invoice"],
+    "bought": ["InvoiceLine", "Invoice"],
+    "spent": ["Invoice"],
+    "order": ["Invoice"],
+    "song": ["Track"],
+    "band": ["Artist"],
+    "musician": ["Artist"],
+    "singer": ["Artist"],
+    "client": ["Customer"],
+    "staff": ["Employee"],
+    "rep": ["Employee"],
+    "agent": ["Employee"],
+    "format": ["MediaType"],
+}
+
+
+def split_identifier(name):
+    """Split a CamelCase identifier into lower-case words."""
+    return [word.lower() for word in re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", name)]
+
+
+def singular(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class Table:
+    def __init__(self, name, columns, foreign_keys):
+        self.name = name
+        self.columns = columns            # [(name, type, is_primary_key)]
+        self.foreign_keys = foreign_keys  # [(column, referenced_table, referenced_column)]
+
+    def render(self):
+        references = {column: f"{table}.{ref}" for column, table, ref in self.foreign_keys}
+        parts = []
+        for name, col_type, is_pk in self.columns:
+            part = f"{name} {col_type}".strip()
+            if is_pk:
+                part += " PK"
+            if name in references:
+                part += f" -> {references[name]}"
+            parts.append(part)
+        return f"{self.name}({', '.join(parts)})"
+
+
+class SchemaModel:
+    """In-memory model of the database tables, columns and foreign keys.
+
+    Built once by introspecting sqlite_master, and used to pick the tables a
+    question needs so prompts carry a minimal schema instead of the full DDL.
+    Tables in `hidden` (the precomputed summaries) are still known to
+    validation but are never picked for a prompt.
+    """
+
+    def __init__(self, tables, hidden=()):
+        self.tables = tables
+        self.hidden = set(hidden) & set(tables)
+        self._neighbours = {name: set() for name in tables}
+        for table in tables.values():
+            for _, referenced, _ in table.foreign_keys:
+                if referenced in tables:
+                    self._neighbours[table.name].add(referenced)
+                    self._neighbours[referenced].add(table.name)
+        self._table_words = {}
+        self._column_words = {}
+        for table in tables.values():
+            if table.name in self.hidden:
+                continue
+            for word in split_identifier(table.name) + [table.name.lower()]:
+                self._table_words.setdefault(singular(word), set()).add(table.name)
+            for column, _, _ in table.columns:
+                for word in split_identifier(column):
+                    self._column_words.setdefault(singular(word), set()).add(table.name)
+        for word, names in SYNONYMS.items():
+            self._table_words.setdefault(word, set()).update(name for name in names if name in tables)
+
+    @classmethod
+    def from_connection(cls, conn, hidden=()):
+        tables = {}
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        for name in names:
+            columns = [(row[1], row[2], bool(row[5]))
+                       for row in conn.execute(f'PRAGMA table_info("{name}")')]
+            foreign_keys = [(row[3], row[2], row[4])
+                            for row in conn.execute(f'PRAGMA foreign_key_list("{name}")')]
+            tables[name] = Table(name, columns, foreign_keys)
+        return cls(tables, hidden)
+
+    def seed_tables(self, question):
+        """Tables named directly, through a synonym, or through a column word unique to one table."""
+        exact = {name.lower(): name for name in self.tables if name not in self.hidden}
+        seeds = set()
+        for word in re.findall(r"[a-z0-9]+", question.lower()):
+            word = singular(word)
+            if word in exact:
+                seeds.add(exact[word])
+            elif word in self._table_words:
+                seeds |= self._table_words[word]
+            elif len(self._column_words.get(word, ())) == 1:
+                seeds |= self._column_words[word]
+        return seeds
+
+    def _path(self, sources, target):
+        """Shortest FK path from any table in sources to target (exclusive of sources)."""
+        previous = {source: None for source in sources}
+        queue = deque(sources)
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                path = []
+                while current not in sources:
+                    path.append(current)
+                    current = previous[current]
+                return path
+            for neighbour in sorted(self._neighbours[current]):
+                if neighbour not in previous:
+                    previous[neighbour] = current
+                    queue.append(neighbour)
+        return [target]
+
+    def relevant_tables(self, question):
+        """Seed tables plus the tables needed to join them along foreign keys."""
+        seeds = sorted(self.seed_tables(question))
+        if not seeds:
+            return sorted(set(self.tables) - self.hidden)
+        selected = {seeds[0]}
+        for seed in seeds[1:]:
+            selected.update(self._path(selected, seed))
+        return sorted(selected)
+
+    def render(self, table_names=None):
+        names = table_names if table_names is not None else sorted(self.tables)
+        return "\n".join(self.tables[name].render() for name in names)
+
+    def prompt_for(self, question):
+        """Return (schema text, table names) containing only what the question needs."""
+        names = self.relevant_tables(question)
+        return self.render(names), names
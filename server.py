@@ -0,0 +1,150 @@
+"""HTTP query service: POST /query answers a question with SQL and rows as JSON.
+
+Start it with `python sql-gpt.py --serve --port 8000`. Every request shares
+one schema model, one LLM backend per model (each with its own client pool)
+and one read-only SQLite connection pool. Identical questions that arrive
+while one is being answered are coalesced: they wait for that answer
+instead of generating and executing their own. Results are capped at
+`row_cap` rows (--row-cap), and a pipeline whose callers have all timed
+out is cancelled.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+
+from flask import Flask, Response, request
+
+from batch import ReadOnlyExecutor, answer_question
+from query_cache import normalize_question
+
+MODELS = ["gpt-3.5-turbo", "gpt-4", "mistral"]
+
+
+class QueryService:
+    """Runs the NL->SQL pipeline for concurrent callers on one background event loop.
+
+    `backend_factory(model)` creates the shared backend for a model the first
+    time it is asked for. Callers from any thread use answer(); requests for
+    the same (question, model, attempts) already in flight share its result.
+    At most `row_cap` rows are returned per answer (None for no limit).
+    `rewrite` and `example_store` plug in the REPL's summary-table routing
+    and example recording.
+    """
+
+    def __init__(self, backend_factory, pool, schema_model, build_schema, query_cache=None, workers=8,
+                 workload=None, default_model="gpt-3.5-turbo", attempts=3, coalesce=True, timeout=120.0,
+                 row_cap=1000, rewrite=None, example_store=None):
+        self.backend_factory = backend_factory
+        self.build_schema = build_schema
+        self.query_cache = query_cache
+        self.example_store = example_store
+        self.default_model = default_model
+        self.attempts = attempts
+        self.coalesce = coalesce
+        self.timeout = timeout
+        self.row_cap = row_cap
+        self.executor = ReadOnlyExecutor(pool, workers, schema_model, workload, row_cap, rewrite)
+        self.backends = {}
+        self.in_flight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.pipelines = 0
+        self.cancelled = 0
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="query-service", daemon=True)
+        self._thread.start()
+
+    def _backend(self, model):
+        if model not in self.backends:
+            self.backends[model] = self.backend_factory(model)
+        return self.backends[model]
+
+    async def _answer(self, question, model, attempts):
+        self.requests += 1
+        key = (normalize_question(question), model, attempts)
+        entry = self.in_flight.get(key) if self.coalesce else None
+        coalesced = entry is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.pipelines += 1
+            task = asyncio.ensure_future(answer_question(
+                question, self._backend(model), self.executor, self.build_schema, attempts, self.query_cache,
+                self.example_store))
+            entry = {"task": task, "waiters": 0}
+            if self.coalesce:
+                self.in_flight[key] = entry
+                task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"]), coalesced
+        finally:
+            entry["waiters"] -= 1
+            if not entry["waiters"] and not entry["task"].done():
+                # Every caller has timed out: stop generating (SQL already running finishes under its budget)
+                self.cancelled += 1
+                entry["task"].cancel()
+
+    def answer(self, question, model=None, attempts=None):
+        """Answer a question from any thread: the batch result record plus whether it was coalesced."""
+        began = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(
+            self._answer(question, model or self.default_model, attempts or self.attempts), self.loop)
+        try:
+            result, coalesced = future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+        return {**result, "coalesced": coalesced, "latency_ms": round((time.perf_counter() - began) * 1000, 1)}
+
+    def stats(self):
+        return {"requests": self.requests, "pipelines": self.pipelines, "coalesced": self.coalesced,
+                "cancelled": self.cancelled, "in_flight": len(self.in_flight)}
+
+    def close(self):
+        async def close_backends():
+            for backend in self.backends.values():
+                await backend.aclose()
+
+        asyncio.run_coroutine_threadsafe(close_backends(), self.loop).result(self.timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.executor.close()
+
+
+def json_response(body, status=200):
+    return Response(json.dumps(body, default=str), status=status, mimetype='application/json')
+
+
+def create_app(service):
+    """Flask app exposing POST /query and GET /stats for a QueryService."""
+    app = Flask(__name__)
+
+    @app.route('/query', methods=['POST'])
+    def query_endpoint():
+        body = request.get_json(silent=True) or {}
+        question = body.get("question")
+        model = body.get("model", service.default_model)
+        attempts = body.get("attempts", service.attempts)
+        if not isinstance(question, str) or not question.strip():
+            return json_response({"error": "'question' is required"}, 400)
+        if model not in MODELS:
+            return json_response({"error": f"'model' must be one of {', '.join(MODELS)}"}, 400)
+        if not isinstance(attempts, int) or not 1 <= attempts <= 10:
+            return json_response({"error": "'attempts' must be an integer from 1 to 10"}, 400)
+        try:
+            result = service.answer(question, model, attempts)
+        except concurrent.futures.TimeoutError:
+            logging.error(f"Query service timed out answering: {question}")
+            return json_response({"error": "Timed out"}, 504)
+        return json_response({"question": question, "model": model, "row_cap": service.row_cap, **result},
+                             422 if result["error"] else 200)
+
+    @app.route('/stats', methods=['GET'])
+    def stats_endpoint():
+        return json_response(service.stats())
+
+    return app
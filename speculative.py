@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import time
+
+
+async def generate_speculative(prompt, backends, candidates, validate):
+    """Request several SQL candidates at once and return the first valid one.
+
+    Candidates are spread round-robin over `backends` and checked in
+    completion order with `validate`, which returns the (possibly fixed) query
+    or raises if it is unusable. As soon as one passes, the outstanding
+    requests are cancelled. The log records the wall-clock time against an
+    estimate of the serial retry path, i.e. one round trip per rejected
+    candidate plus one for the winner.
+    """
+    start = time.perf_counter()
+
+    async def candidate(backend):
+        began = time.perf_counter()
+        sql_query = await backend.generate(prompt)
+        return backend.model, sql_query, time.perf_counter() - began
+
+    tasks = [asyncio.create_task(candidate(backends[i % len(backends)])) for i in range(candidates)]
+    rejected = []
+    latencies = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                model, sql_query, latency = await next_done
+            except Exception as e:
+                rejected.append(f"generation failed: {e}")
+                continue
+            latencies.append(latency)
+            try:
+                sql_query = validate(sql_query)
+            except Exception as e:
+                logging.info(f"Speculative candidate from {model} rejected: {e}")
+                rejected.append(f"{model}: {e}")
+                continue
+            wall = time.perf_counter() - start
+            serial_estimate = sum(latencies) / len(latencies) * (len(rejected) + 1)
+            logging.info(f"Speculative generation picked {model} candidate after {wall * 1000:.0f} ms "
+                         f"({len(rejected)} rejected of {candidates}); serial retries would take ~{serial_estimate * 1000:.0f} ms, "
+                         f"saving ~{(serial_estimate - wall) * 1000:.0f} ms")
+            return sql_query
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    raise ValueError(f"None of the {candidates} SQL candidates passed validation: {'; '.join(rejected)}")
@@ -1,32 +1,103 @@
-import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
 from rich.console import Console
-from rich.table import Table
 import argparse
+import asyncio
+import atexit
 import os
+import re
 from dotenv import load_dotenv
-from openai import OpenAI
-import requests
 import logging
+import time
+from functools import lru_cache
+from query_cache import QueryCache
+from db_pool import ConnectionManager
+from result_cache import ResultCache
+from index_advisor import WorkloadLog
+from example_store import ExampleStore
+from schema_model import SchemaModel, estimate_tokens
+import summary_tables
+from llm_backends import OLLAMA_URL, SYSTEM_PROMPT, OllamaStream, build_prompt, create_backend, ollama_payload
+from batch import run_batch
+from speculative import generate_speculative
+from sql_validation import inject_limit, validate_sql
+import tracing
+from tracing import annotate, setup_logging, span, traced
 
-# Set up logging
-logging.basicConfig(filename='app.log', level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# pandas, matplotlib, the OpenAI SDK and requests are imported on first use
+# so that --help, --batch and --model mistral do not pay for them at startup.
+
+# Set up logging (written by a background thread so it never blocks the hot path)
+setup_logging('app.log')
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Connect to the SQLite database
-conn = sqlite3.connect('Chinook.db')
-cursor = conn.cursor()
-
 # Initialize Rich console
 console = Console()
 
+# Path of the SQLite database
+DB_PATH = 'Chinook.db'
+
+# Rows fetched per page when streaming query results
+PAGE_SIZE = 50
+
+# Offer and use the precomputed summary tables built by summary_tables.py
+USE_SUMMARIES = True
+
+# Past successful questions retrieved into each prompt as few-shot examples
+FEW_SHOT_EXAMPLES = 3
+
+# Where graph results are written, and as what (png or svg)
+CHART_DIR = 'charts'
+CHART_FORMAT = 'png'
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Create the OpenAI client on first use."""
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+@lru_cache(maxsize=None)
+def get_ollama_session():
+    """Keep-alive HTTP session reused for every Ollama request."""
+    import requests
+    return requests.Session()
+
+@lru_cache(maxsize=None)
+def get_db_pool():
+    """Read-only connection manager shared by everything that queries the database."""
+    return ConnectionManager(DB_PATH)
+
+def get_connection():
+    """Read-only SQLite connection for the calling thread."""
+    return get_db_pool().connection()
+
+@lru_cache(maxsize=None)
+def get_result_cache():
+    return ResultCache(DB_PATH)
+
+@lru_cache(maxsize=None)
+def get_workload_log():
+    """Log of executed SQL read by index_advisor.py."""
+    return WorkloadLog()
+
+@lru_cache(maxsize=None)
+def get_example_store():
+    """Past questions and their SQL, retrieved as few-shot examples."""
+    return ExampleStore()
+
+@lru_cache(maxsize=None)
+def get_chart_renderer():
+    """Headless (Agg) chart renderer whose figure is reused for every graph."""
+    from rendering import ChartRenderer
+    return ChartRenderer()
+
+@lru_cache(maxsize=None)
+def get_schema_model():
+    """Introspect the database schema once."""
+    return SchemaModel.from_connection(get_connection(), hidden=summary_tables.SUMMARY_TABLES)
+
+@traced()
+@lru_cache(maxsize=None)
 def load_schema_from_file(file_path='schema.txt'):
     """Load the database schema from a file."""
     try:
@@ -36,81 +107,148 @@ def load_schema_from_file(file_path='schema.txt'):
         logging.error(f"Schema file not found: {file_path}")
         return None
 
+@traced()
+def build_schema_prompt(question):
+    """Return the minimal schema needed for the question and log the prompt tokens saved."""
+    schema_model = get_schema_model()
+    schema, tables = schema_model.prompt_for(question)
+    if USE_SUMMARIES:
+        schema += summary_tables.prompt_for(question, get_connection())
+    if FEW_SHOT_EXAMPLES:
+        schema += get_example_store().prompt_for(question, FEW_SHOT_EXAMPLES)
+    full_schema = load_schema_from_file()
+    tokens = estimate_tokens(schema)
+    if full_schema:
+        saved = estimate_tokens(full_schema) - tokens
+        logging.info(f"Schema prompt uses {len(tables)}/{len(schema_model.tables) - len(schema_model.hidden)} tables ({', '.join(tables)}), "
+                     f"~{tokens} tokens, ~{saved} fewer than the full schema")
+    else:
+        logging.info(f"Schema prompt uses {len(tables)}/{len(schema_model.tables) - len(schema_model.hidden)} tables, ~{tokens} tokens")
+    return schema
+
+@traced()
 def generate_sql_query_openai(question, model="gpt-3.5-turbo", error_message=None):
     """Generate SQL query using OpenAI API."""
-    schema = load_schema_from_file()
+    schema = build_schema_prompt(question)
     if not schema:
         logging.error("Unable to load database schema.")
         return "Error: Unable to load database schema."
 
-    prompt = f"""Given the following SQLite database schema:
-
-    {schema}
-
-    Generate a SQL query to answer the following question:
-    {question}
-
-    Provide only the SQL query without any explanation."""
-
-    if error_message:
-        prompt += f"\n\nThe previous query resulted in the following error: {error_message}\nPlease correct the query."
+    prompt = build_prompt(schema, question, error_message)
 
     try:
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates SQL queries."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ]
         )
         query = response.choices[0].message.content.strip()
+        if response.usage:
+            annotate(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
         logging.info(f"Generated SQL query: {query}")
         return query
     except Exception as e:
         logging.error(f"Error generating SQL query: {str(e)}")
         return f"Error: {str(e)}"
 
+@traced()
 def generate_sql_query_mistral(question, error_message=None):
-    """Generate SQL query using local Mistral model via Ollama."""
-    schema = load_schema_from_file()
+    """Generate SQL query using local Mistral model via Ollama.
+
+    The completion is streamed and the request closed as soon as a complete
+    statement has arrived.
+    """
+    schema = build_schema_prompt(question)
     if not schema:
         logging.error("Unable to load database schema.")
         return "Error: Unable to load database schema."
 
-    prompt = f"""Given the following SQLite database schema:
-        {schema}
-
-        Generate a SQL query to answer the following question:
-        {question}
-
-        Provide only the SQL query without any explanation."""
-
-    if error_message:
-        prompt += f"\n\nThe previous query resulted in the following error: {error_message}\nPlease correct the query."
+    prompt = build_prompt(schema, question, error_message)
 
     try:
-        response = requests.post('http://localhost:11434/api/generate', 
-                                 json={
-                                     "model": "mistral",
-                                     "prompt": prompt
-                                 })
-        query = response.json()['response'].strip()
-        logging.info(f"Generated SQL query: {query}")
+        start = time.perf_counter()
+        stream = OllamaStream()
+        response = get_ollama_session().post(f'{OLLAMA_URL}/api/generate',
+                                             json=ollama_payload("mistral", prompt), stream=True)
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if stream.feed(line):
+                    break
+        finally:
+            response.close()
+        query = stream.result()
+        logging.info(f"Generated SQL query in {(time.perf_counter() - start) * 1000:.1f} ms"
+                     f"{' (stopped early)' if stream.stopped_early else ''}: {query}")
         return query
     except Exception as e:
         logging.error(f"Error generating SQL query with Mistral: {str(e)}")
         return f"Error: {str(e)}"
 
-def execute_query(query):
-    """Execute the SQL query and return the results as a pandas DataFrame."""
-    try:
-        df = pd.read_sql_query(query, conn)
-        logging.info(f"Query executed successfully. Result shape: {df.shape}")
-        return df
-    except Exception as e:
-        logging.error(f"Error executing query: {str(e)}")
-        raise
+def generate_sql_query(question, model, error_message=None):
+    """Generate SQL query with the backend matching the chosen model."""
+    if model == "mistral":
+        return generate_sql_query_mistral(question, error_message)
+    return generate_sql_query_openai(question, model=model, error_message=error_message)
 
+def stream_query(query, row_cap=None, page_size=PAGE_SIZE):
+    """Execute the SQL query and yield the results page by page as DataFrames.
+
+    At most row_cap rows are read; a LIMIT is injected so SQLite can stop early.
+    The first page always carries the column names, even for an empty result.
+    Results that fit in a single page, without hitting row_cap, are stored in
+    the result cache.
+    """
+    import pandas as pd
+
+    conn = get_connection()
+    result_cache = get_result_cache()
+    start = time.perf_counter()
+    df = result_cache.get(query, conn)
+    if df is not None:
+        logging.info(f"Query served from result cache in {(time.perf_counter() - start) * 1000:.1f} ms. Result shape: {df.shape}")
+        get_workload_log().record(query, (time.perf_counter() - start) * 1000, cached=True)
+        if row_cap and len(df) > row_cap:
+            df = df.iloc[:row_cap]
+            console.print(f"[bold yellow]Result truncated to the first {row_cap} rows (see --row-cap).[/bold yellow]")
+        yield df.iloc[:page_size]
+        for offset in range(page_size, len(df), page_size):
+            yield df.iloc[offset:offset + page_size]
+        return
+
+    # One budget covers the statement and all of its pages, so paging cannot reset the clock
+    with get_db_pool().budget():
+        cursor = conn.execute(inject_limit(query, row_cap + 1) if row_cap else query)
+        try:
+            columns = [description[0] for description in cursor.description]
+            fetched = 0
+            while True:
+                size = min(page_size, row_cap - fetched) if row_cap else page_size
+                rows = cursor.fetchmany(size) if size > 0 else []
+                if not rows and fetched:
+                    break
+                page = pd.DataFrame.from_records(rows, columns=columns)
+                if not fetched:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    logging.info(f"First page of {len(rows)} rows ready in {elapsed_ms:.1f} ms")
+                    get_workload_log().record(query, elapsed_ms)
+                    if len(rows) < size:
+                        # Fewer rows than asked for: this page is the complete, uncapped result
+                        result_cache.put(query, conn, page)
+                fetched += len(rows)
+                yield page
+                if not rows:
+                    break
+            if row_cap and fetched == row_cap and cursor.fetchone() is not None:
+                logging.info(f"Result truncated at {row_cap} rows")
+                console.print(f"[bold yellow]Result truncated to the first {row_cap} rows (see --row-cap).[/bold yellow]")
+            logging.info(f"Streamed {fetched} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+        finally:
+            cursor.close()
+
+@traced()
 def determine_output_format(question, df):
     """Determine the appropriate output format based on the question and results."""
     if df.empty:
@@ -124,6 +262,7 @@ def determine_output_format(question, df):
     logging.info(f"Determined output format: {format}")
     return format
 
+@traced()
 def display_result(question, df, output_format):
     """Display the result in the specified format."""
     logging.info(f"Displaying result in format: {output_format}")
@@ -135,67 +274,230 @@ def display_result(question, df, output_format):
             result = df.iloc[0, 0] if df.shape == (1, 1) else df.to_string(index=False)
             console.print(result, style="bold green")
     elif output_format == "table":
-        table = Table(title=question)
-        for column in df.columns:
-            table.add_column(column, style="cyan")
-        for _, row in df.iterrows():
-            table.add_row(*[str(val) for val in row])
-        console.print(table)
+        from rendering import build_table
+        console.print(build_table(question, df))
     elif output_format == "graph":
-        plt.figure(figsize=(10, 6))
-        if df.shape[1] == 2:
-            plt.bar(df.iloc[:, 0], df.iloc[:, 1])
-            plt.xlabel(df.columns[0])
-            plt.ylabel(df.columns[1])
+        os.makedirs(CHART_DIR, exist_ok=True)
+        slug = "-".join(re.findall(r"\w+", question.lower()))[:60] or "chart"
+        path = os.path.join(CHART_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}.{CHART_FORMAT}")
+        try:
+            get_chart_renderer().render(question, df, path)
+        except Exception as e:
+            # The query succeeded; show the rows instead of regenerating the SQL
+            logging.error(f"Error rendering chart: {str(e)}")
+            from rendering import build_table
+            console.print(f"[bold yellow]Could not draw a chart ({e}); showing a table instead.[/bold yellow]")
+            if len(df) > PAGE_SIZE:
+                # Same limit as the table shown for a large result's first page
+                console.print(f"[bold]First {PAGE_SIZE} of {len(df)} rows:[/bold]")
+                df = df.head(PAGE_SIZE)
+            console.print(build_table(question, df))
         else:
-            df.plot(kind='bar')
-        plt.title(question)
-        plt.tight_layout()
-        plt.show()
+            console.print(f"[bold]Chart saved to[/bold] {path}")
     
     logging.info("Result displayed successfully")
 
+@traced()
+def validate_query(query):
+    """Check and locally fix a generated query against the schema before it is executed."""
+    return validate_sql(query, get_schema_model(), get_connection())
+
+@traced()
+def route_to_summary(query):
+    """Redirect an aggregate query to a precomputed summary table when one answers it."""
+    if not USE_SUMMARIES:
+        return query
+    rewritten, summary = summary_tables.rewrite(query, get_schema_model(), get_connection())
+    if summary:
+        console.print(f"[dim]Answered from summary table {summary}[/dim]")
+    return rewritten
+
+def print_trace_summary():
+    """Print the per-stage latency distribution collected by the tracer."""
+    from rich.table import Table
+
+    table = Table(title="Stage latency (ms)")
+    for column in ["stage", "count", "total", "p50", "p95", "max"]:
+        table.add_column(column, style="cyan", justify="left" if column == "stage" else "right")
+    for name, stats in sorted(tracing.summary().items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        table.add_row(name, str(stats["count"]), f"{stats['total_ms']:.1f}", f"{stats['p50_ms']:.1f}",
+                      f"{stats['p95_ms']:.1f}", f"{stats['max_ms']:.1f}")
+    console.print(table)
+
+def run_batch_mode(args, query_cache):
+    """Answer every question in the --batch file and print throughput and latency stats."""
+    async def run():
+        async with create_backend(args.model, max_concurrency=args.workers) as backend:
+            return await run_batch(args.batch, args.output, backend, build_schema_prompt,
+                                   attempts=args.attempts, workers=args.workers, query_cache=query_cache,
+                                   pool=get_db_pool(), schema_model=get_schema_model(),
+                                   workload=get_workload_log())
+
+    stats = asyncio.run(run())
+    console.print(f"[bold]Batch complete:[/bold] {stats['questions']} questions, {stats['failures']} failed, "
+                  f"{stats['questions_per_s']} questions/sec, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms")
+    console.print(f"Results written to {args.output}")
+
+def run_serve_mode(args, query_cache):
+    """Serve POST /query over HTTP until interrupted."""
+    from server import QueryService, create_app
+
+    service = QueryService(lambda model: create_backend(model, max_concurrency=args.workers), get_db_pool(),
+                           get_schema_model(), build_schema_prompt, query_cache, workers=args.workers,
+                           workload=get_workload_log(), default_model=args.model, attempts=args.attempts,
+                           row_cap=args.row_cap or None, rewrite=route_to_summary,
+                           example_store=get_example_store())
+    console.print(f"[bold]Serving POST /query on http://{args.host}:{args.port}[/bold]")
+    try:
+        create_app(service).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        logging.info(f"Query service stats: {service.stats()}")
+        service.close()
+
 def main():
+    global DB_PATH, USE_SUMMARIES, FEW_SHOT_EXAMPLES, CHART_DIR, CHART_FORMAT
     parser = argparse.ArgumentParser(description="LLM SQL Query Generator for Chinook Database")
     parser.add_argument("--model", choices=["gpt-3.5-turbo", "gpt-4", "mistral"], default="gpt-3.5-turbo",
                         help="Choose the LLM model to use (default: gpt-3.5-turbo)")
     parser.add_argument("--attempts", type=int, default=3,
                         help="Maximum number of attempts to generate a correct SQL query (default: 3)")
+    parser.add_argument("--db", default=DB_PATH,
+                        help="SQLite database to query, e.g. a scaled copy from build_chinook.py (default: Chinook.db)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the persistent question-to-SQL cache")
+    parser.add_argument("--similarity", type=float, default=0.9,
+                        help="Word similarity (order-aware) needed to reuse SQL cached for a reworded question, 0 to disable (default: 0.9)")
+    parser.add_argument("--no-result-cache", action="store_true",
+                        help="Always execute SQL against the database instead of reusing cached results")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Answer the questions in a JSONL file (one {\"question\": ...} per line) instead of prompting")
+    parser.add_argument("--output", default="batch_results.jsonl",
+                        help="Where --batch writes its JSONL results (default: batch_results.jsonl)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of concurrent --batch workers (default: 4)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Answer questions over HTTP (POST /query) instead of prompting")
+    parser.add_argument("--host", default="127.0.0.1", help="Address --serve listens on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port --serve listens on (default: 8000)")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Request this many SQL candidates in parallel and run the first that passes EXPLAIN (default: 1, off)")
+    parser.add_argument("--candidate-models", nargs="+", choices=["gpt-3.5-turbo", "gpt-4", "mistral"],
+                        help="Models to spread --candidates across (default: --model)")
+    parser.add_argument("--row-cap", type=int, default=1000,
+                        help="Maximum rows fetched for an interactive question, 0 for no limit (default: 1000)")
+    parser.add_argument("--query-timeout", type=float, default=10.0,
+                        help="Cancel a query that runs longer than this many seconds (default: 10)")
+    parser.add_argument("--no-summaries", action="store_true",
+                        help="Ignore the precomputed summary tables in prompts and queries")
+    parser.add_argument("--examples", type=int, default=FEW_SHOT_EXAMPLES,
+                        help="Past successful questions to include in each prompt as examples, 0 to disable (default: 3)")
+    parser.add_argument("--chart-dir", default=CHART_DIR,
+                        help="Directory graph results are written to (default: charts)")
+    parser.add_argument("--chart-format", choices=["png", "svg"], default=CHART_FORMAT,
+                        help="Image format for graph results (default: png)")
+    parser.add_argument("--no-workload-log", action="store_true",
+                        help="Do not append executed SQL to workload.jsonl for index_advisor.py")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write per-stage timing spans to FILE as JSON lines")
+    parser.add_argument("--trace-summary", action="store_true",
+                        help="Print a per-stage latency summary on exit")
     args = parser.parse_args()
 
-    logging.info(f"Application started with model: {args.model}, max attempts: {args.attempts}")
+    DB_PATH = args.db
+    USE_SUMMARIES = not args.no_summaries
+    FEW_SHOT_EXAMPLES = args.examples
+    CHART_DIR = args.chart_dir
+    CHART_FORMAT = args.chart_format
+    logging.info(f"Application started with model: {args.model}, max attempts: {args.attempts}, database: {DB_PATH}")
+    if args.trace:
+        tracing.export_traces(args.trace)
+    if args.trace_summary:
+        atexit.register(print_trace_summary)
+    query_cache = None if args.no_cache else QueryCache(
+        schema_text=get_schema_model().render(), db_path=DB_PATH, similarity_threshold=args.similarity)
+    get_result_cache().enabled = not args.no_result_cache
+    get_workload_log().enabled = not args.no_workload_log
+    get_db_pool().timeout_s = args.query_timeout
+
+    if args.batch:
+        run_batch_mode(args, query_cache)
+        return
+    if args.serve:
+        run_serve_mode(args, query_cache)
+        return
+
+    speculative_loop = None
+    if args.candidates > 1:
+        speculative_loop = asyncio.new_event_loop()
+        speculative_backends = [create_backend(model) for model in args.candidate_models or [args.model]]
 
     while True:
         question = console.input("[bold cyan]Enter your question (type 'quit' or 'exit' to end): [/bold cyan]")
         
         if question.lower() in ["quit", "exit"]:
             logging.info("User requested to quit the application")
+            if query_cache:
+                logging.info(f"Query cache stats: {query_cache.stats()}")
+                query_cache.close()
+            if speculative_loop:
+                for backend in speculative_backends:
+                    speculative_loop.run_until_complete(backend.aclose())
+                speculative_loop.close()
             break
 
-        error_message = None
-        for attempt in range(args.attempts):
-            try:
-                if args.model == "mistral":
-                    sql_query = generate_sql_query_mistral(question, error_message)
-                else:
-                    sql_query = generate_sql_query_openai(question, model=args.model, error_message=error_message)
-                
-                console.print(f"\n[bold]SQL Query:[/bold] {sql_query}\n")
+        with span("question", model=args.model, question=question) as question_span:
+            error_message = None
+            sql_query = None
+            cached_query = query_cache.get(question, args.model) if query_cache else None
+            for attempt in range(args.attempts):
+                question_span.attrs["retries"] = attempt
+                try:
+                    with span("attempt", attempt=attempt + 1):
+                        if attempt == 0 and cached_query:
+                            sql_query = validate_query(cached_query)
+                            console.print("[dim]Using cached SQL query[/dim]")
+                        elif speculative_loop:
+                            prompt = build_prompt(build_schema_prompt(question), question, error_message)
+                            # The race returns the winner already validated (and fixed)
+                            sql_query = speculative_loop.run_until_complete(
+                                generate_speculative(prompt, speculative_backends, args.candidates, validate_query))
+                        else:
+                            sql_query = validate_query(generate_sql_query(question, args.model, error_message))
                 
-                df = execute_query(sql_query)
-                output_format = determine_output_format(question, df)
+                        console.print(f"\n[bold]SQL Query:[/bold] {sql_query}\n")
                 
-                console.print("[bold]Results:[/bold]")
-                display_result(question, df, output_format)
-                logging.info(f"Query processed successfully on attempt {attempt + 1}")
-                break
-            except Exception as e:
-                error_message = str(e)
-                logging.error(f"Attempt {attempt + 1} failed. Error: {error_message}")
-                if attempt == args.attempts - 1:
-                    console.print(f"[bold red]Failed to generate a correct SQL query after {args.attempts} attempts. Last error: {error_message}[/bold red]")
-                else:
-                    console.print(f"[bold yellow]Attempt {attempt + 1} failed. Retrying...[/bold yellow]")
+                        pages = stream_query(route_to_summary(sql_query), args.row_cap)
+                        with span("execute_query", streamed=True):
+                            df = next(pages)
+                        if len(df) < PAGE_SIZE:
+                            output_format = determine_output_format(question, df)
+                            console.print("[bold]Results:[/bold]")
+                            display_result(question, df, output_format)
+                        else:
+                            # Large result: show the first page now, fetch the rest only for a graph
+                            console.print(f"[bold]Results (first {len(df)} rows):[/bold]")
+                            display_result(question, df, "table")
+                            if determine_output_format(question, df) == "graph":
+                                import pandas as pd
+                                with span("execute_query.remaining_pages"):
+                                    df = pd.concat([df, *pages], ignore_index=True)
+                                display_result(question, df, "graph")
+                        # Release the query's budget now rather than whenever the generator is collected
+                        pages.close()
+                        logging.info(f"Query processed successfully on attempt {attempt + 1}")
+                        question_span.attrs["success"] = True
+                        if query_cache and sql_query != cached_query:
+                            query_cache.put(question, args.model, sql_query)
+                        get_example_store().record(question, sql_query, success=True, model=args.model)
+                        break
+                except Exception as e:
+                    error_message = str(e)
+                    logging.error(f"Attempt {attempt + 1} failed. Error: {error_message}")
+                    if attempt == args.attempts - 1:
+                        get_example_store().record(question, sql_query, success=False, model=args.model)
+                        console.print(f"[bold red]Failed to generate a correct SQL query after {args.attempts} attempts. Last error: {error_message}[/bold red]")
+                    else:
+                        console.print(f"[bold yellow]Attempt {attempt + 1} failed. Retrying...[/bold yellow]")
         
         console.print("\n" + "-"*50 + "\n")
 
@@ -0,0 +1,241 @@
+import difflib
+import logging
+import re
+import sqlite3
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*"|\[[^\]]*\]|`[^`]*`)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<other>\s+|.)
+""", re.VERBOSE | re.DOTALL)
+
+# The closing fence may be missing when generation was stopped early
+FENCE_PATTERN = re.compile(r"```(?:sql|sqlite)?\s*(.*?)(?:```|$)", re.IGNORECASE | re.DOTALL)
+PREFIX_PATTERN = re.compile(r"^\s*(?:sql(?: query)?|query)\s*:\s*", re.IGNORECASE)
+
+# Keywords that can open a line of SQL, so such a line is never taken for prose
+SQL_KEYWORDS = {
+    "SELECT", "WITH", "RECURSIVE", "FROM", "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER",
+    "NATURAL", "ON", "USING", "AND", "OR", "NOT", "GROUP", "ORDER", "BY", "HAVING", "LIMIT", "OFFSET", "UNION",
+    "INTERSECT", "EXCEPT", "ALL", "DISTINCT", "CASE", "WHEN", "THEN", "ELSE", "END", "AS", "IN", "IS", "NULL",
+    "LIKE", "BETWEEN", "EXISTS", "ASC", "DESC", "OVER", "PARTITION", "WINDOW", "VALUES", "MATERIALIZED",
+}
+
+# Built-in table-valued functions that may follow FROM / JOIN, besides the pragma_* functions
+TABLE_VALUED_FUNCTIONS = {"json_each", "json_tree"}
+
+
+class SQLValidationError(ValueError):
+    """Raised when generated SQL cannot be fixed locally and needs another LLM attempt."""
+
+
+def _is_prose(line):
+    """True for an English sentence such as "This query lists every track." rather than a line of SQL."""
+    words = line.split()
+    return (len(words) >= 3 and "=" not in line
+            and re.fullmatch(r"[A-Z][a-z]+[,:]?", words[0]) is not None
+            and re.fullmatch(r"[a-z]+[,:]?", words[1]) is not None
+            and not {words[0].rstrip(",:").upper(), words[1].rstrip(",:").upper()} & SQL_KEYWORDS)
+
+
+def strip_sql(text):
+    """Pull the SQL statement out of an LLM reply (markdown fences, 'SQL:' prefixes, trailing prose).
+
+    The statement ends at its `;`, or, when that is missing, before the first
+    line of prose that follows it.
+    """
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    text = PREFIX_PATTERN.sub("", text.strip())
+    statement = ""
+    for line in text.splitlines(keepends=True):
+        if statement.strip() and _is_prose(line):
+            break
+        statement += line
+        if sqlite3.complete_statement(statement):
+            break
+    return statement.strip()
+
+
+def tokenize(sql):
+    return [(match.lastgroup, match.group()) for match in TOKEN_PATTERN.finditer(sql)]
+
+
+def unquote(token):
+    return token[1:-1] if token[:1] in ('"', '[', '`') else token
+
+
+def _closest(name, candidates):
+    """Exact case-insensitive match, else a single close spelling, else None."""
+    lowered = {candidate.lower(): candidate for candidate in candidates}
+    if name.lower() in lowered:
+        return lowered[name.lower()]
+    matches = difflib.get_close_matches(name.lower(), list(lowered), n=1, cutoff=0.85)
+    return lowered[matches[0]] if matches else None
+
+
+def _check_single_select(sql):
+    if not sql:
+        raise SQLValidationError("The response did not contain a SQL query.")
+    body = sql.rstrip().rstrip(";")
+    if ";" in [value for kind, value in tokenize(body) if kind == "other"]:
+        raise SQLValidationError("Only a single SQL statement is allowed.")
+    words = [value.upper() for kind, value in tokenize(body) if kind == "word"]
+    if not words or words[0] not in ("SELECT", "WITH"):
+        raise SQLValidationError("Only read-only SELECT queries are allowed.")
+
+
+def _cte_names(tokens, significant):
+    """Lower-cased names defined by WITH [RECURSIVE] name [(columns)] AS (...), ... anywhere in the query."""
+    names = set()
+    values = [tokens[index][1] for index in significant]
+
+    def skip_parentheses(n):
+        depth = 0
+        while n < len(values):
+            depth += values[n] == "("
+            depth -= values[n] == ")"
+            n += 1
+            if not depth:
+                break
+        return n
+
+    for n, value in enumerate(values):
+        if value.upper() != "WITH":
+            continue
+        n += 1
+        if n < len(values) and values[n].upper() == "RECURSIVE":
+            n += 1
+        while n < len(values) and tokens[significant[n]][0] in ("word", "quoted"):
+            names.add(unquote(values[n]).lower())
+            n += 1
+            if n < len(values) and values[n] == "(":
+                n = skip_parentheses(n)
+            if n >= len(values) or values[n].upper() != "AS":
+                break
+            n += 1
+            if n + 1 < len(values) and values[n].upper() == "NOT" and values[n + 1].upper() == "MATERIALIZED":
+                n += 2
+            elif n < len(values) and values[n].upper() == "MATERIALIZED":
+                n += 1
+            n = skip_parentheses(n)
+            if n >= len(values) or values[n] != ",":
+                break
+            n += 1
+    return names
+
+
+def fix_identifiers(sql, schema_model):
+    """Correct table/column spelling and case against the schema.
+
+    Returns (fixed sql, list of fixes, referenced tables). Raises
+    SQLValidationError for table or qualified column references that cannot
+    be matched.
+    """
+    tokens = tokenize(sql)
+    fixes = []
+    significant = [i for i, (kind, value) in enumerate(tokens)
+                   if kind != "comment" and (kind != "other" or not value.isspace())]
+    cte_names = _cte_names(tokens, significant)
+
+    # Table references follow FROM / JOIN
+    aliases = {}
+    for n, index in enumerate(significant[:-1]):
+        if tokens[index][1].upper() not in ("FROM", "JOIN"):
+            continue
+        target = significant[n + 1]
+        kind, value = tokens[target]
+        if kind not in ("word", "quoted") or unquote(value).lower() in cte_names:
+            continue
+        name = unquote(value)
+        is_call = n + 2 < len(significant) and tokens[significant[n + 2]][1] == "("
+        if is_call and (name.lower() in TABLE_VALUED_FUNCTIONS or name.lower().startswith("pragma_")):
+            continue
+        table = _closest(name, schema_model.tables)
+        if table is None:
+            raise SQLValidationError(
+                f"no such table: {name}. Available tables: {', '.join(sorted(schema_model.tables))}")
+        if table != name:
+            fixes.append(f"{name} -> {table}")
+            tokens[target] = (kind, value.replace(name, table))
+        aliases[table.lower()] = table
+        alias_position = n + 2
+        if alias_position < len(significant) and tokens[significant[alias_position]][1].upper() == "AS":
+            alias_position += 1
+        if alias_position < len(significant) and tokens[significant[alias_position]][0] == "word":
+            aliases[tokens[significant[alias_position]][1].lower()] = table
+
+    # Qualified columns (alias.Column) and bare column names
+    all_columns = {column for table in schema_model.tables.values() for column, _, _ in table.columns}
+    for n, index in enumerate(significant):
+        kind, value = tokens[index]
+        if kind not in ("word", "quoted"):
+            continue
+        previous = tokens[significant[n - 1]][1] if n else ""
+        if previous == "." and n >= 2:
+            owner = aliases.get(unquote(tokens[significant[n - 2]][1]).lower())
+            if owner is None:
+                continue
+            columns = [column for column, _, _ in schema_model.tables[owner].columns]
+            name = unquote(value)
+            column = _closest(name, columns)
+            if column is None:
+                raise SQLValidationError(f"no such column: {owner}.{name}. {schema_model.tables[owner].render()}")
+        elif kind == "word" and previous.upper() != "AS":
+            name = value
+            column = next((column for column in all_columns if column.lower() == name.lower()), None)
+            if column is None:
+                continue
+        else:
+            continue
+        if column != name:
+            fixes.append(f"{name} -> {column}")
+            tokens[index] = (kind, value.replace(name, column))
+    return "".join(value for _, value in tokens), fixes, sorted(set(aliases.values()))
+
+
+def validate_sql(text, schema_model, conn):
+    """Clean, check and locally fix a generated query, returning SQL that is safe to execute.
+
+    Raises SQLValidationError with a message suitable for the next LLM attempt
+    when the query cannot be repaired here.
+    """
+    sql = strip_sql(text)
+    _check_single_select(sql)
+    sql, fixes, tables = fix_identifiers(sql, schema_model)
+    if fixes:
+        logging.info(f"SQL validator fixed identifiers: {', '.join(fixes)}")
+    try:
+        conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.Error as e:
+        message = str(e)
+        if "no such column" in message and tables:
+            message += ". Columns available: " + "; ".join(schema_model.tables[name].render() for name in tables)
+        raise SQLValidationError(message) from e
+    if sql != text.strip():
+        logging.info(f"SQL validator rewrote query to: {sql}")
+    return sql
+
+
+def inject_limit(sql, limit):
+    """Append LIMIT to a query that has no top-level LIMIT clause of its own.
+
+    Comments and string literals are skipped when looking for LIMIT, and
+    trailing comments are dropped so the appended clause is not commented out.
+    """
+    tokens = tokenize(sql)
+    while tokens and (tokens[-1][0] == "comment" or tokens[-1][1].isspace() or tokens[-1][1] == ";"):
+        tokens.pop()
+    sql = "".join(value for _, value in tokens)
+    depth = 0
+    for kind, value in tokens:
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif kind == "word" and depth == 0 and value.upper() == "LIMIT":
+            return sql
+    return f"{sql}\nLIMIT {limit}"
@@ -0,0 +1,551 @@
+"""Precomputed sales summaries and the rewrite that routes aggregate queries to them.
+
+Usage: python summary_tables.py [--db Chinook.db] [--full]
+
+The summaries live in the database itself, next to the tables they
+aggregate, and are kept current incrementally: a watermark records the last
+Invoice/InvoiceLine id folded in, and a refresh only aggregates the rows
+added since, upserting the deltas. Deleted rows are noticed through the
+watermark row counts and trigger a full rebuild; edits to existing rows
+(or renamed albums, artists and genres) need --full.
+
+The app only uses summaries that are up to date with their source tables;
+otherwise prompts and queries go to the raw tables as before.
+"""
+import argparse
+import logging
+import sqlite3
+import time
+
+from sql_validation import tokenize, unquote
+
+WATERMARK_TABLE = "SummaryWatermark"
+
+
+class Summary:
+    """One aggregate table: its DDL, delta query and what raw SQL it can stand in for.
+
+    `sources` lists the table sets (joined along foreign keys) it can replace,
+    `dimensions` maps canonical column expressions to summary columns and
+    `measures` maps canonical aggregates to their re-aggregation over the
+    summary rows.
+    """
+
+    def __init__(self, name, columns, source, delta, description, sources, dimensions, measures, keywords):
+        self.name = name
+        self.columns = columns
+        self.source = source
+        self.delta = delta
+        self.description = description
+        self.sources = [frozenset(tables) for tables in sources]
+        self.dimensions = dimensions
+        self.measures = measures
+        self.keywords = keywords
+
+    @property
+    def key(self):
+        return self.columns[0].split()[0]
+
+    @property
+    def column_names(self):
+        return [column.split()[0] for column in self.columns]
+
+    def ddl(self):
+        return f"CREATE TABLE IF NOT EXISTS {self.name} ({', '.join(self.columns)}, PRIMARY KEY ({self.key}))"
+
+    def upsert(self):
+        names = self.column_names
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in names if name in ("Invoices", "Lines", "TracksSold", "Sales"))
+        return (f"INSERT INTO {self.name} ({', '.join(names)}) {self.delta} "
+                f"ON CONFLICT ({self.key}) DO UPDATE SET {updates}")
+
+    def render(self):
+        return f"{self.name}({', '.join(self.columns)}) -- {self.description}"
+
+
+def _ref(table, column):
+    """Canonical form of a resolved column reference, as produced by canonical_tokens()."""
+    return f"\x00{table.lower()}.{column.lower()}\x00"
+
+
+INVOICE_DATE = _ref("Invoice", "InvoiceDate")
+INVOICE_MEASURES = {
+    f"sum({_ref('Invoice', 'Total')})": "SUM(Sales)",
+    f"total({_ref('Invoice', 'Total')})": "TOTAL(Sales)",
+    f"avg({_ref('Invoice', 'Total')})": "SUM(Sales) / SUM(Invoices)",
+    "count(*)": "COALESCE(SUM(Invoices),0)",
+    f"count({_ref('Invoice', 'InvoiceId')})": "COALESCE(SUM(Invoices),0)",
+}
+LINE_MEASURES = {
+    f"sum({_ref('InvoiceLine', 'UnitPrice')}*{_ref('InvoiceLine', 'Quantity')})": "SUM(Sales)",
+    f"sum({_ref('InvoiceLine', 'Quantity')}*{_ref('InvoiceLine', 'UnitPrice')})": "SUM(Sales)",
+    f"total({_ref('InvoiceLine', 'UnitPrice')}*{_ref('InvoiceLine', 'Quantity')})": "TOTAL(Sales)",
+    f"total({_ref('InvoiceLine', 'Quantity')}*{_ref('InvoiceLine', 'UnitPrice')})": "TOTAL(Sales)",
+    f"sum({_ref('InvoiceLine', 'Quantity')})": "SUM(TracksSold)",
+    "count(*)": "COALESCE(SUM(Lines),0)",
+    f"count({_ref('InvoiceLine', 'InvoiceLineId')})": "COALESCE(SUM(Lines),0)",
+}
+LINE_JOINS = "FROM InvoiceLine il JOIN Track t ON t.TrackId = il.TrackId"
+LINE_TOTALS = "COUNT(*), SUM(il.Quantity), SUM(il.UnitPrice * il.Quantity)"
+SALES_WORDS = ["sale", "sales", "sold", "selling", "revenue", "spend", "spent", "earn", "earned", "total"]
+
+SUMMARIES = [
+    Summary(
+        "SalesByYear", ["Year TEXT", "Invoices INTEGER", "Sales REAL"], "Invoice",
+        "SELECT strftime('%Y', InvoiceDate), COUNT(*), SUM(Total) FROM Invoice WHERE InvoiceId > ? GROUP BY 1",
+        "Invoice count and SUM(Invoice.Total) per year of InvoiceDate ('2013')",
+        [{"Invoice"}],
+        {f"strftime('%Y',{INVOICE_DATE})": "Year", f"substr({INVOICE_DATE},1,4)": "Year"},
+        INVOICE_MEASURES, ["year", "yearly", "annual"]),
+    Summary(
+        "SalesByMonth", ["Month TEXT", "Year TEXT", "Invoices INTEGER", "Sales REAL"], "Invoice",
+        "SELECT strftime('%Y-%m', InvoiceDate), strftime('%Y', InvoiceDate), COUNT(*), SUM(Total) "
+        "FROM Invoice WHERE InvoiceId > ? GROUP BY 1",
+        "Invoice count and SUM(Invoice.Total) per month of InvoiceDate ('2013-07')",
+        [{"Invoice"}],
+        {f"strftime('%Y-%m',{INVOICE_DATE})": "Month", f"substr({INVOICE_DATE},1,7)": "Month",
+         f"strftime('%Y',{INVOICE_DATE})": "Year", f"substr({INVOICE_DATE},1,4)": "Year",
+         f"strftime('%m',{INVOICE_DATE})": "substr(Month,6,2)"},
+        INVOICE_MEASURES, ["month", "monthly"]),
+    Summary(
+        "SalesByCountry", ["Country TEXT", "Invoices INTEGER", "Sales REAL"], "Invoice",
+        "SELECT BillingCountry, COUNT(*), SUM(Total) FROM Invoice WHERE InvoiceId > ? GROUP BY 1",
+        "Invoice count and SUM(Invoice.Total) per Invoice.BillingCountry",
+        [{"Invoice"}],
+        {_ref("Invoice", "BillingCountry"): "Country"},
+        INVOICE_MEASURES, ["country", "countries"]),
+    Summary(
+        "SalesByGenre", ["GenreId INTEGER", "Genre TEXT", "Lines INTEGER", "TracksSold INTEGER", "Sales REAL"],
+        "InvoiceLine",
+        f"SELECT g.GenreId, g.Name, {LINE_TOTALS} {LINE_JOINS} JOIN Genre g ON g.GenreId = t.GenreId "
+        "WHERE il.InvoiceLineId > ? GROUP BY g.GenreId",
+        "invoice lines, SUM(Quantity) and SUM(UnitPrice * Quantity) per genre",
+        [{"InvoiceLine", "Track", "Genre"}],
+        {_ref("Genre", "GenreId"): "GenreId", _ref("Track", "GenreId"): "GenreId", _ref("Genre", "Name"): "Genre"},
+        LINE_MEASURES, ["genre", "genres"]),
+    Summary(
+        "SalesByArtist", ["ArtistId INTEGER", "Artist TEXT", "Lines INTEGER", "TracksSold INTEGER", "Sales REAL"],
+        "InvoiceLine",
+        f"SELECT ar.ArtistId, ar.Name, {LINE_TOTALS} {LINE_JOINS} JOIN Album al ON al.AlbumId = t.AlbumId "
+        "JOIN Artist ar ON ar.ArtistId = al.ArtistId WHERE il.InvoiceLineId > ? GROUP BY ar.ArtistId",
+        "invoice lines, SUM(Quantity) and SUM(UnitPrice * Quantity) per artist",
+        [{"InvoiceLine", "Track", "Album", "Artist"}],
+        {_ref("Artist", "ArtistId"): "ArtistId", _ref("Album", "ArtistId"): "ArtistId", _ref("Artist", "Name"): "Artist"},
+        LINE_MEASURES, ["artist", "artists", "band", "bands"]),
+    Summary(
+        "SalesByAlbum", ["AlbumId INTEGER", "Album TEXT", "ArtistId INTEGER", "Artist TEXT", "Lines INTEGER",
+                         "TracksSold INTEGER", "Sales REAL"],
+        "InvoiceLine",
+        f"SELECT al.AlbumId, al.Title, ar.ArtistId, ar.Name, {LINE_TOTALS} {LINE_JOINS} "
+        "JOIN Album al ON al.AlbumId = t.AlbumId JOIN Artist ar ON ar.ArtistId = al.ArtistId "
+        "WHERE il.InvoiceLineId > ? GROUP BY al.AlbumId",
+        "invoice lines, SUM(Quantity) and SUM(UnitPrice * Quantity) per album",
+        [{"InvoiceLine", "Track", "Album"}, {"InvoiceLine", "Track", "Album", "Artist"}],
+        {_ref("Album", "AlbumId"): "AlbumId", _ref("Track", "AlbumId"): "AlbumId", _ref("Album", "Title"): "Album",
+         _ref("Album", "ArtistId"): "ArtistId", _ref("Artist", "ArtistId"): "ArtistId", _ref("Artist", "Name"): "Artist"},
+        LINE_MEASURES, ["album", "albums"]),
+]
+
+SUMMARY_TABLES = [summary.name for summary in SUMMARIES] + [WATERMARK_TABLE]
+SOURCE_KEYS = {"Invoice": "InvoiceId", "InvoiceLine": "InvoiceLineId"}
+
+# Anything outside plain SELECT ... FROM ... JOIN ... GROUP BY is left alone
+UNSUPPORTED = {"WITH", "UNION", "INTERSECT", "EXCEPT", "DISTINCT", "OVER", "LEFT", "RIGHT", "FULL", "CROSS",
+               "NATURAL", "USING", "OUTER", "WINDOW", "CASE", "EXISTS", "IN", "MIN", "MAX", "GROUP_CONCAT"}
+CLAUSE_WORDS = {"SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT"}
+# Words that cannot be an implicit column alias, or come right before something that is not one
+NOT_ALIAS = {"IS", "NOT", "NULL", "AND", "OR", "LIKE", "GLOB", "REGEXP", "MATCH", "COLLATE", "ESCAPE", "BETWEEN",
+             "TRUE", "FALSE", "THEN", "ELSE", "END", "AS"}
+
+
+def refresh(conn, full=False):
+    """Fold new Invoice/InvoiceLine rows into the summaries; returns {"mode", "rows", "elapsed_ms"}.
+
+    conn must be writable. Runs in one transaction.
+    """
+    began = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} "
+                     "(SourceTable TEXT PRIMARY KEY, LastId INTEGER NOT NULL, RowCount INTEGER NOT NULL, RefreshedAt TEXT)")
+        for summary in SUMMARIES:
+            conn.execute(summary.ddl())
+        watermarks = {row[0]: (row[1], row[2]) for row in conn.execute(f"SELECT SourceTable, LastId, RowCount FROM {WATERMARK_TABLE}")}
+        for table, key in SOURCE_KEYS.items():
+            last_id, row_count = watermarks.get(table, (0, 0))
+            if conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} <= ?", (last_id,)).fetchone()[0] != row_count:
+                logging.warning(f"Rows of {table} changed below the summary watermark; rebuilding summaries")
+                full = True
+        if full or len(watermarks) < len(SOURCE_KEYS):
+            for summary in SUMMARIES:
+                conn.execute(f"DELETE FROM {summary.name}")
+            watermarks = {}
+            mode = "full"
+        else:
+            mode = "incremental"
+
+        rows = {}
+        for table, key in SOURCE_KEYS.items():
+            last_id = watermarks.get(table, (0, 0))[0]
+            rows[table] = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} > ?", (last_id,)).fetchone()[0]
+            for summary in SUMMARIES:
+                if summary.source == table:
+                    conn.execute(summary.upsert(), (last_id,))
+            new_last, count = conn.execute(f"SELECT COALESCE(MAX({key}), 0), COUNT(*) FROM {table}").fetchone()
+            conn.execute(f"INSERT OR REPLACE INTO {WATERMARK_TABLE} VALUES (?, ?, ?, datetime('now'))",
+                         (table, new_last, count))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    stats = {"mode": mode, "rows": rows, "elapsed_ms": round((time.perf_counter() - began) * 1000, 1)}
+    logging.info(f"Summary refresh: {stats}")
+    return stats
+
+
+def is_fresh(conn):
+    """True when the summaries exist and include every Invoice/InvoiceLine row."""
+    try:
+        watermarks = dict(conn.execute(f"SELECT SourceTable, LastId FROM {WATERMARK_TABLE}").fetchall())
+    except sqlite3.OperationalError:
+        return False
+    return all(watermarks.get(table) == conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}").fetchone()[0]
+               for table, key in SOURCE_KEYS.items())
+
+
+def prompt_for(question, conn):
+    """Schema lines for the summaries the question may use, or "" when there are none (or they are stale)."""
+    words = set(question.lower().replace("?", " ").split())
+    if not words & set(SALES_WORDS) or not is_fresh(conn):
+        return ""
+    lines = [summary.render() for summary in SUMMARIES if words & set(summary.keywords)]
+    if not lines:
+        return ""
+    return ("\n\nPrecomputed summary tables (current; prefer them over joining Invoice/InvoiceLine for these totals):\n"
+            + "\n".join(lines))
+
+
+def _significant(tokens):
+    return [token for token in tokens if not token[1].isspace()]
+
+
+def _split_top_level(tokens, separator):
+    """Split tokens on a keyword or symbol that is not inside parentheses."""
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        value = token[1]
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        if depth == 0 and value.upper() == separator:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+
+def _clauses(tokens):
+    """Map each top-level clause keyword to its tokens, or None for shapes the rewrite does not handle."""
+    clauses, current, depth, skip_by = {}, None, 0, False
+    for index, (kind, value) in enumerate(tokens):
+        upper = value.upper()
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        if kind == "word" and upper in UNSUPPORTED or (upper == "SELECT" and (current or depth)):
+            return None
+        if skip_by and not value.isspace():
+            if upper != "BY":
+                return None
+            skip_by = False
+        elif depth == 0 and kind == "word" and upper in CLAUSE_WORDS:
+            if upper in clauses:
+                return None
+            current = upper
+            clauses[current] = []
+            skip_by = upper in ("GROUP", "ORDER")
+        elif current is not None:
+            clauses[current].append((kind, value))
+        elif not value.isspace():
+            return None
+    return clauses
+
+
+def _from_tables(tokens, schema_model):
+    """Resolve FROM ... JOIN ... ON to ({alias: table}, tables, ON conditions); None unless plain inner joins."""
+    aliases, tables, conditions = {}, [], []
+    for position, segment in enumerate(_split_top_level(_significant(tokens), "JOIN")):
+        if segment and segment[-1][1].upper() == "INNER":
+            segment = segment[:-1]
+        on = [index for index, (_, value) in enumerate(segment) if value.upper() == "ON"]
+        head = segment[:on[0]] if on else segment
+        if on:
+            conditions.append(segment[on[0] + 1:])
+        elif position:
+            return None
+        head = [token for token in head if token[1].upper() != "AS"]
+        if not head or len(head) > 2 or head[0][0] not in ("word", "quoted"):
+            return None
+        table = next((name for name in schema_model.tables if name.lower() == unquote(head[0][1]).lower()), None)
+        if table is None or table in tables:
+            return None
+        tables.append(table)
+        aliases[table.lower()] = table
+        if len(head) == 2:
+            aliases[unquote(head[1][1]).lower()] = table
+    return aliases, set(tables), conditions
+
+
+def _wordlike(text):
+    return bool(text) and (text[-1].isalnum() or text[-1] in "_\x00'\"]`")
+
+
+def canonical_tokens(tokens, aliases, columns):
+    """Canonical text of an expression, or None if a column reference is ambiguous.
+
+    Column references become \\x00table.column\\x00, keywords are lower-cased
+    and whitespace is kept only where it separates two words.
+    """
+    parts, pending_space = [], False
+    n = 0
+    while n < len(tokens):
+        kind, value = tokens[n]
+        if value.isspace():
+            pending_space = True
+            n += 1
+            continue
+        if kind in ("word", "quoted") and n + 2 < len(tokens) and tokens[n + 1][1] == ".":
+            table = aliases.get(unquote(value).lower())
+            column = unquote(tokens[n + 2][1]).lower()
+            if table is None or column not in columns[table]:
+                return None
+            text, n = _ref(table, column), n + 3
+        elif kind == "expression":
+            text, n = value, n + 1
+        else:
+            if kind in ("word", "quoted"):
+                name = unquote(value).lower()
+                owners = [table for table in columns if name in columns[table]]
+                if len(owners) > 1:
+                    return None
+                text = _ref(owners[0], name) if owners else name
+            else:
+                text = value if kind == "string" else value.lower()
+            n += 1
+        if pending_space and parts and _wordlike(parts[-1]) and (text[0].isalnum() or text[0] in "_\x00'\"[`"):
+            parts.append(" ")
+        parts.append(text)
+        pending_space = False
+    return "".join(parts)
+
+
+def _translate(text, summary, measures=True):
+    """Replace canonical measures and dimensions with summary columns; None if a raw reference is left."""
+    if text is None:
+        return None
+    replacements = dict(summary.dimensions)
+    if measures:
+        replacements.update(summary.measures)
+    for canonical in sorted(replacements, key=len, reverse=True):
+        text = text.replace(canonical, replacements[canonical])
+    return None if "\x00" in text else text
+
+
+def _joins_follow_foreign_keys(conditions, aliases, columns, schema_model):
+    pairs = set()
+    for table in columns:
+        for column, referenced, referenced_column in schema_model.tables[table].foreign_keys:
+            if referenced in columns:
+                pairs.add(frozenset({_ref(table, column), _ref(referenced, referenced_column)}))
+    for condition in conditions:
+        for part in _split_top_level(condition, "AND"):
+            sides = [canonical_tokens(side, aliases, columns) for side in _split_top_level(part, "=")]
+            if len(sides) != 2 or None in sides or frozenset(sides) not in pairs:
+                return False
+    return True
+
+
+def rewrite(sql, schema_model, conn):
+    """Return (sql, summary name) with a matching aggregate query redirected to a summary, else (sql, None).
+
+    Only aggregate queries over plain inner joins along foreign keys are
+    considered: the query must GROUP BY or select a measure, every column it
+    selects outside a measure must be grouped, every expression must map onto
+    the summary's columns, and the summaries must be fresh. Output column
+    names are preserved.
+    """
+    # Comments act as whitespace; _rewrite_with declines ones among the select items
+    tokens = [(kind, " ") if kind == "comment" else (kind, value) for kind, value in tokenize(sql)]
+    while tokens and (tokens[-1][1].isspace() or tokens[-1][1] == ";"):
+        tokens.pop()
+    clauses = _clauses(tokens)
+    if not clauses or "FROM" not in clauses or "SELECT" not in clauses:
+        return sql, None
+    resolved = _from_tables(clauses["FROM"], schema_model)
+    if resolved is None:
+        return sql, None
+    aliases, tables, conditions = resolved
+    candidates = [summary for summary in SUMMARIES if tables in summary.sources]
+    if not candidates:
+        return sql, None
+    columns = {table: {column.lower() for column, _, _ in schema_model.tables[table].columns} for table in tables}
+    if not _joins_follow_foreign_keys(conditions, aliases, columns, schema_model):
+        return sql, None
+
+    for summary in candidates:
+        rewritten = _rewrite_with(summary, clauses, aliases, columns)
+        if rewritten:
+            if not is_fresh(conn):
+                logging.info(f"Summary {summary.name} matches but is stale; querying the raw tables")
+                return sql, None
+            logging.info(f"Rewrote aggregate query to use {summary.name}: {rewritten}")
+            return rewritten, summary.name
+    return sql, None
+
+
+def _implicit_alias(significant):
+    """True when the last select-item token is an alias written without AS (`substr(x, 1, 4) y`)."""
+    if len(significant) < 2:
+        return False
+    (kind, value), (previous_kind, previous) = significant[-1], significant[-2]
+    return (kind in ("word", "quoted") and value.upper() not in NOT_ALIAS and previous.upper() not in NOT_ALIAS
+            and (previous == ")" or previous_kind in ("word", "quoted", "string")))
+
+
+def _only_grouped(text, summary, groups):
+    """True if every column reference in canonical text sits inside a measure or a grouped expression."""
+    for expression in sorted([*summary.measures, *groups], key=len, reverse=True):
+        text = text.replace(expression, "")
+    return "\x00" not in text
+
+
+def _group_expressions(tokens, select_items, aliases, columns):
+    """Canonical GROUP BY terms, resolving positions (GROUP BY 1) and select aliases; None if one cannot be."""
+    groups = []
+    for term in _split_top_level(tokens, ","):
+        significant = _significant(term)
+        text = "".join(value for _, value in significant)
+        if text.isdigit() and 1 <= int(text) <= len(select_items):
+            groups.append(select_items[int(text) - 1][1])
+            continue
+        named = [canonical for alias, canonical in select_items if alias.lower() == unquote(text).lower()]
+        if len(significant) == 1 and named and not any(unquote(text).lower() in table_columns
+                                                         for table_columns in columns.values()):
+            groups.append(named[0])
+            continue
+        canonical = canonical_tokens(term, aliases, columns)
+        if canonical is None:
+            return None
+        groups.append(canonical)
+    return groups
+
+
+def _rewrite_with(summary, clauses, aliases, columns):
+    if any(kind == "comment" for kind, _ in clauses["SELECT"]):
+        # SQLite names an unaliased column after its text, comment included
+        return None
+    select_items = []
+    for item in _split_top_level(clauses["SELECT"], ","):
+        significant = _significant(item)
+        if not significant or significant[-1][1] == "*":
+            return None
+        alias = None
+        if len(significant) >= 3 and significant[-2][1].upper() == "AS":
+            alias = unquote(significant[-1][1])
+            significant = significant[:-2]
+            item = item[:max(index for index, token in enumerate(item) if token[1].upper() == "AS")]
+        elif _implicit_alias(significant):
+            alias = unquote(significant[-1][1])
+            significant = significant[:-1]
+            item = item[:max(index for index, token in enumerate(item) if not token[1].isspace())]
+        canonical = canonical_tokens(item, aliases, columns)
+        if canonical is None:
+            return None
+        if alias is None:
+            # Keep the column name SQLite gives the original expression
+            plain = len(significant) == 1 or (len(significant) == 3 and significant[1][1] == ".")
+            alias = unquote(significant[-1][1]) if plain else "".join(value for _, value in item).strip()
+        select_items.append((alias, canonical))
+
+    # Without aggregation each summary row would stand in for many raw rows
+    groups = []
+    if "GROUP" in clauses:
+        groups = _group_expressions(clauses["GROUP"], select_items, aliases, columns)
+        if groups is None:
+            return None
+        if any(summary.dimensions.get(group) == summary.key for group in groups):
+            # One group per summary row: its other dimensions (the artist's name, say) are fixed too
+            groups += list(summary.dimensions)
+    elif not any(measure in canonical for _, canonical in select_items for measure in summary.measures):
+        return None
+    if not all(_only_grouped(canonical, summary, groups) for _, canonical in select_items):
+        return None
+
+    items, select_aliases = [], {}
+    for alias, canonical in select_items:
+        expression = _translate(canonical, summary)
+        if expression is None:
+            return None
+        select_aliases[alias.lower()] = expression
+        items.append(f'{_tidy(expression)} AS "{alias}"')
+
+    parts = [f"SELECT {', '.join(items)} FROM {summary.name}"]
+    for clause, keyword, allow_measures in [("WHERE", "WHERE", False), ("GROUP", "GROUP BY", False),
+                                            ("HAVING", "HAVING", True), ("ORDER", "ORDER BY", True)]:
+        if clause not in clauses:
+            continue
+        tokens = clauses[clause]
+        if clause != "ORDER":
+            # Spell out select aliases: on the summary the same name may be one of its columns
+            tokens = [_expand_alias(tokens, index, select_aliases, columns) for index in range(len(tokens))]
+        canonical = canonical_tokens(tokens, aliases, columns)
+        if clause in ("HAVING", "ORDER") and canonical is not None and not _only_grouped(canonical, summary, groups):
+            return None
+        translated = _translate(canonical, summary, allow_measures)
+        if translated is None:
+            return None
+        parts.append(f"{keyword} {_tidy(translated)}")
+    if "LIMIT" in clauses:
+        limit = canonical_tokens(clauses["LIMIT"], aliases, columns)
+        if limit is None or "\x00" in limit:
+            return None
+        parts.append(f"LIMIT {limit}")
+    return " ".join(parts)
+
+
+def _expand_alias(tokens, index, select_aliases, columns):
+    kind, value = tokens[index]
+    name = unquote(value).lower()
+    dotted = (index and tokens[index - 1][1] == ".") or (index + 1 < len(tokens) and tokens[index + 1][1] == ".")
+    if kind not in ("word", "quoted") or dotted or name not in select_aliases \
+            or any(name in table_columns for table_columns in columns.values()):
+        return kind, value
+    return ("expression", f"({select_aliases[name]})")
+
+
+def _tidy(text):
+    """Add a space after each comma outside string literals."""
+    return "".join(value + " " if value == "," else value for _, value in tokenize(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or refresh the precomputed sales summary tables")
+    parser.add_argument("--db", default="Chinook.db", help="Database to summarise (default: Chinook.db)")
+    parser.add_argument("--full", action="store_true", help="Rebuild every summary from scratch")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    stats = refresh(conn, args.full)
+    for summary in SUMMARIES:
+        count = conn.execute(f"SELECT COUNT(*) FROM {summary.name}").fetchone()[0]
+        print(f"{summary.name:<16}{count:>8,} rows")
+    conn.close()
+    print(f"{stats['mode'].capitalize()} refresh of {sum(stats['rows'].values()):,} source rows in {stats['elapsed_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from rendering import format_column
+
+
+def test_small_floats_keep_their_precision():
+    text, justify = format_column(pd.Series([0.0049, 1e-7, 0.005, 0.0, 1.234, -0.003]))
+    assert list(text) == ["0.0049", "1e-07", "0.005", "0.00", "1.23", "-0.003"]
+    assert justify == "right"
+
+
+def test_whole_and_non_finite_floats():
+    assert list(format_column(pd.Series([1.0, 2.0, np.nan]))[0])[:2] == ["1", "2"]
+    assert list(format_column(pd.Series([1.5, np.inf]))[0]) == ["1.50", "inf"]
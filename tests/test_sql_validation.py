@@ -0,0 +1,45 @@
+import os
+import sqlite3
+
+import pytest
+
+from schema_model import SchemaModel
+from sql_validation import inject_limit, strip_sql, validate_sql
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Chinook.db")
+
+
+@pytest.fixture(scope="module")
+def conn():
+    connection = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def schema_model(conn):
+    return SchemaModel.from_connection(conn)
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH RECURSIVE cnt(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM cnt WHERE x < 5) SELECT x FROM cnt",
+    "WITH t(n) AS (SELECT COUNT(*) FROM Track) SELECT n FROM t",
+    "WITH top AS (SELECT * FROM Track), picked(Name) AS MATERIALIZED (SELECT Name FROM top) SELECT Name FROM picked",
+])
+def test_cte_names_are_not_unknown_tables(sql, schema_model, conn):
+    assert validate_sql(sql, schema_model, conn) == sql
+
+
+def test_table_valued_functions_are_allowed(schema_model, conn):
+    sql = "SELECT value FROM json_each('[1, 2]')"
+    assert validate_sql(sql, schema_model, conn) == sql
+
+
+def test_strip_sql_drops_prose_after_a_statement_without_semicolon():
+    assert strip_sql("SELECT Name FROM Track\n\nThis query lists every track.") == "SELECT Name FROM Track"
+    assert strip_sql("SELECT Name,\n  Title AS Album\nFROM Track") == "SELECT Name,\n  Title AS Album\nFROM Track"
+
+
+def test_inject_limit_ignores_limit_in_comments_and_literals():
+    assert inject_limit("SELECT 'LIMIT 3' FROM Track -- LIMIT 5\n;", 10) == "SELECT 'LIMIT 3' FROM Track\nLIMIT 10"
+    assert inject_limit("SELECT * FROM Track LIMIT 5;", 10) == "SELECT * FROM Track LIMIT 5"
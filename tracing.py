@@ -0,0 +1,163 @@
+import atexit
+import collections
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+# Percentiles come from the most recent samples so a long-running --serve stays bounded
+MAX_SAMPLES_PER_SPAN = 1000
+_durations = {}
+_durations_lock = threading.Lock()
+_trace_logger = logging.getLogger("sqlgpt.trace")
+_trace_logger.propagate = False
+_listeners = []
+
+
+class _Durations:
+    """Running count/total/max of one span name plus a bounded window of recent samples."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = collections.deque(maxlen=MAX_SAMPLES_PER_SPAN)
+
+    def add(self, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.recent.append(duration_ms)
+
+
+class Span:
+    def __init__(self, name, attrs):
+        parent = _current_span.get()
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start = time.time()
+        self.duration_ms = None
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "name": self.name, "start": round(self.start, 6), "duration_ms": self.duration_ms,
+                **self.attrs}
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block of work as a named span nested under the current one."""
+    current = Span(name, attrs)
+    token = _current_span.set(current)
+    began = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - began) * 1000, 3)
+        _current_span.reset(token)
+        _record(current)
+
+
+def annotate(**attrs):
+    """Attach attributes (token counts, retry counts, ...) to the current span."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def traced(name=None):
+    """Decorator running every call of the function inside a span."""
+    def decorator(function):
+        span_name = name or function.__name__
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(finished):
+    with _durations_lock:
+        _durations.setdefault(finished.name, _Durations()).add(finished.duration_ms)
+    if _trace_logger.handlers:
+        _trace_logger.info(json.dumps(finished.to_dict(), default=str))
+
+
+def _start_queue_listener(logger, handler):
+    """Route a logger through a QueueHandler so callers never block on file I/O."""
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def setup_logging(log_file='app.log', level=logging.DEBUG):
+    """Configure the root logger to write to log_file from a background thread."""
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root = logging.getLogger()
+    root.setLevel(level)
+    _start_queue_listener(root, handler)
+
+
+def export_traces(trace_file):
+    """Write every finished span to trace_file as one JSON object per line."""
+    handler = logging.FileHandler(trace_file)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _trace_logger.setLevel(logging.INFO)
+    _start_queue_listener(_trace_logger, handler)
+
+
+def summary():
+    """Per-span count, total and max (ms) collected in this process.
+
+    p50/p95 are taken over the last MAX_SAMPLES_PER_SPAN spans of each name.
+    """
+    stats = {}
+    with _durations_lock:
+        items = {name: (d.count, d.total_ms, d.max_ms, sorted(d.recent)) for name, d in _durations.items()}
+    for name, (count, total_ms, max_ms, values) in items.items():
+        stats[name] = {
+            "count": count,
+            "total_ms": round(total_ms, 1),
+            "p50_ms": values[len(values) // 2],
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max_ms": max_ms,
+        }
+    return stats
+
+
+def reset():
+    with _durations_lock:
+        _durations.clear()
+
+
+@atexit.register
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
@@ -0,0 +1,169 @@
+"""Deterministic XML encoding and decoding of the pydantic models sent to the legacy app.
+
+The element layout is derived once from the model fields: a field becomes a
+PascalCase element, a nested model a nested element, and a list of models a
+plural container holding one element per item, e.g.
+
+    <Person>
+      <Header><SourceSystem>GENAI-DRIVER</SourceSystem>...</Header>
+      <Name>John Doe</Name>
+      <Vehicles><Vehicle><Make>Toyota</Make>...</Vehicle></Vehicles>
+    </Person>
+
+The Header holds the configurable extra mainframe nodes; it is written on
+encode and ignored on decode. XML whose root is not a known model is turned
+into plain nested dicts by element_to_dict.
+"""
+import io
+import typing
+import xml.etree.ElementTree as ET
+
+from pydantic import BaseModel, ValidationError
+
+# Extra nodes the mainframe expects in every record header; values may be callables
+DEFAULT_EXTRA_NODES = {
+    "SourceSystem": "GENAI-DRIVER",
+    "RecordType": "PERSON",
+    "RecordVersion": "01",
+    "Action": "UPSERT",
+}
+
+HEADER_TAG = "Header"
+
+
+class XmlCodecError(ValueError):
+    """Raised when XML does not match the model layout."""
+
+
+def tag_for(field_name):
+    return "".join(part.capitalize() for part in field_name.split("_"))
+
+
+class XmlCodec:
+    """Encodes one pydantic model class to XML and back, following its fields."""
+
+    def __init__(self, model, tag=None, extra_nodes=None):
+        self.model = model
+        self.tag = tag or model.__name__
+        self.extra_nodes = DEFAULT_EXTRA_NODES if extra_nodes is None else extra_nodes
+        # (field name, element tag, kind, item tag, codec for nested models)
+        self.fields = []
+        for name, field in model.model_fields.items():
+            annotation = field.annotation
+            if typing.get_origin(annotation) in (list, typing.List):
+                item = typing.get_args(annotation)[0]
+                if isinstance(item, type) and issubclass(item, BaseModel):
+                    self.fields.append((name, tag_for(name), "models", item.__name__, XmlCodec(item, extra_nodes={})))
+                else:
+                    self.fields.append((name, tag_for(name), "values", "Item", None))
+            elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                self.fields.append((name, tag_for(name), "model", None, XmlCodec(annotation, extra_nodes={})))
+            else:
+                self.fields.append((name, tag_for(name), "value", None, None))
+
+    def to_element(self, obj, tag=None):
+        element = ET.Element(tag or self.tag)
+        if self.extra_nodes:
+            header = ET.SubElement(element, HEADER_TAG)
+            for name, value in self.extra_nodes.items():
+                ET.SubElement(header, name).text = str(value() if callable(value) else value)
+        for name, tag, kind, item_tag, codec in self.fields:
+            value = getattr(obj, name)
+            if value is None:
+                continue
+            if kind == "value":
+                ET.SubElement(element, tag).text = str(value)
+            elif kind == "model":
+                element.append(codec.to_element(value, tag))
+            else:
+                container = ET.SubElement(element, tag)
+                for item in value:
+                    if kind == "models":
+                        container.append(codec.to_element(item, item_tag))
+                    else:
+                        ET.SubElement(container, item_tag).text = str(item)
+        return element
+
+    def to_data(self, element):
+        """Dict of field values read from an element, ready for model validation."""
+        children = {child.tag: child for child in element}
+        data = {}
+        for name, tag, kind, item_tag, codec in self.fields:
+            child = children.get(tag)
+            if child is None:
+                continue
+            if kind == "value":
+                data[name] = child.text or ""
+            elif kind == "model":
+                data[name] = codec.to_data(child)
+            elif kind == "models":
+                data[name] = [codec.to_data(item) for item in child.findall(item_tag)]
+            else:
+                data[name] = [item.text or "" for item in child.findall(item_tag)]
+        return data
+
+    def from_element(self, element):
+        if element.tag != self.tag:
+            raise XmlCodecError(f"Expected <{self.tag}>, got <{element.tag}>")
+        try:
+            return self.model.model_validate(self.to_data(element))
+        except ValidationError as e:
+            raise XmlCodecError(f"<{self.tag}> does not match {self.model.__name__}: {e}") from e
+
+    def encode(self, obj):
+        """XML text for a model instance."""
+        return ET.tostring(self.to_element(obj), encoding="unicode")
+
+    def decode(self, xml):
+        """Model instance from XML text or bytes."""
+        try:
+            element = ET.fromstring(xml)
+        except ET.ParseError as e:
+            raise XmlCodecError(f"Invalid XML: {e}") from e
+        return self.from_element(element)
+
+    def iterdecode(self, source):
+        """Yield a model instance per <tag> record in a file-like object or XML bytes, in bounded memory.
+
+        The records may sit under any wrapper elements, nested to any depth.
+        Each one is parsed incrementally with iterparse and detached from its
+        parent once decoded, as is everything else that ends outside a record.
+        """
+        if isinstance(source, (bytes, str)):
+            source = io.BytesIO(source.encode() if isinstance(source, str) else source)
+        open_elements = []
+        depth = 0
+        try:
+            for event, element in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    open_elements.append(element)
+                    depth += element.tag == self.tag
+                    continue
+                open_elements.pop()
+                if element.tag == self.tag:
+                    depth -= 1
+                    if depth == 0:
+                        yield self.from_element(element)
+                if depth:
+                    continue
+                if open_elements:
+                    open_elements[-1].remove(element)
+                element.clear()
+        except ET.ParseError as e:
+            raise XmlCodecError(f"Invalid XML: {e}") from e
+
+
+def element_to_dict(element):
+    """Plain nested dict for XML of any shape: {tag: text} for leaves, repeated tags become lists."""
+    if len(element) == 0:
+        return {element.tag: (element.text or "").strip()}
+    content = {}
+    for child in element:
+        value = element_to_dict(child)[child.tag]
+        if child.tag in content:
+            if not isinstance(content[child.tag], list):
+                content[child.tag] = [content[child.tag]]
+            content[child.tag].append(value)
+        else:
+            content[child.tag] = value
+    return {element.tag: content}